@@ -2,8 +2,7 @@
 
 import argparse
 import logging
-import logging.config
-import yaml
+import sys
 
 import logic
 
@@ -20,29 +19,162 @@ def setup_logging(path, loglevel):
     if not isinstance(numeric_level, int):
         raise ValueError('Invalid log level: {}'.format(loglevel))
 
+    # Only imported once the arguments parsed, --help stays fast
+    import yaml
+    from logging.config import dictConfig
+
     with open(path, 'r') as f:
         config = yaml.safe_load(f.read())
 
     config['handlers']['console']['level'] = numeric_level
 
-    logging.config.dictConfig(config)
+    dictConfig(config)
+
+def logic_options(args):
+    if args.regions_path:
+        import regions
+    return dict(
+        regions=regions.load(args.regions_path) if args.regions_path else None,
+        formats=args.formats.split(","),
+        precision=args.precision,
+        engine=args.engine,
+        pipeline=args.pipeline,
+        writer=args.writer,
+        jobs=args.jobs,
+        chunksize=args.chunksize,
+        tile_size=args.tile_size,
+        cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_size=args.cache_size * 1024 * 1024,
+        incremental=args.incremental,
+        delta_path=args.delta_path,
+        delta_href=args.delta_href,
+        match_distance=args.match_distance,
+        match_similarity=args.match_similarity,
+        match_report_path=args.match_report_path,
+        snapshot_path=args.snapshot_path,
+        dem_dir=args.dem_dir,
+        dem_cache_size=args.dem_cache_size * 1024 * 1024,
+        metrics_path=args.metrics_path,
+        rejects_path=args.rejects_path,
+        profile_dir=args.profile_dir,
+        profile_top=args.profile_top,
+    )
 
 def main(args):
-    # Compose logic class name
-    logic_class_name = "{}Logic".format(args.logic)
-    # Call logic class
-    logic_cls = getattr(logic, logic_class_name)
-    logger.info("Calling {} with args {}".format(logic_class_name, args))
-    return logic_cls(args.in_paths, args.out_path).run()
+    # Import logic class by name
+    logic_cls = logic.load(args.logic)
+    logger.info("Calling {} with args {}".format(logic_cls.__name__, args))
+    if args.serve:
+        import server
+        builder = server.Builder(
+            logic_cls, args.in_paths, args.out_path, args.watch_interval, **logic_options(args)
+        )
+        return server.serve(builder, args.host, args.port)
+    return logic_cls(args.in_paths, args.out_path, **logic_options(args)).run()
+
+def floats(text):
+    return [float(value) for value in text.split(",")]
+
+def query(argv):
+    """`airstripmap.py query`: nearest, radius and bounding box queries on a snapshot."""
+    parser = argparse.ArgumentParser(prog="airstripmap.py query", description="Query airstrips saved with --format snapshot")
+    parser.add_argument("snapshot_path", help="Airstrips saved with --format snapshot")
+    parser.add_argument("--near", dest="points", type=floats, action="append", default=[], help="Query point --near=LAT,LON, repeatable")
+    parser.add_argument("--points", dest="points_path", help="CSV file of query points with latitude and longitude columns")
+    parser.add_argument("--k", dest="k", type=int, default=1, help="Nearest airstrips per point")
+    parser.add_argument("--radius", dest="radius", type=float, help="All airstrips within this many km instead of the nearest")
+    parser.add_argument("--bbox", dest="bbox", type=floats, help="Airstrips inside --bbox=NORTH,SOUTH,EAST,WEST")
+    parser.add_argument("--status", dest="statuses", help="Comma separated statuses to keep, e.g. a,b")
+    parser.add_argument("--min-length", dest="min_length", type=float, help="Minimum runway length in metres")
+    parser.add_argument("--min-width", dest="min_width", type=float, help="Minimum runway width in metres")
+    args = parser.parse_args(argv)
+
+    import csv
+    import numpy as np
+    from logic.index import AirstripIndex
+
+    index = AirstripIndex.load(args.snapshot_path)
+    mask = index.select(
+        args.statuses.split(",") if args.statuses else None, args.min_length, args.min_width
+    )
+    points = list(args.points)
+    if args.points_path:
+        import pandas
+        df = pandas.read_csv(args.points_path)
+        points.extend(zip(df.latitude.tolist(), df.longitude.tolist()))
+
+    # (point, rank, position, distance) rows
+    results = []
+    if args.bbox:
+        results.extend((None, rank, i, None) for rank, i in enumerate(index.in_bbox(*args.bbox, mask=mask)))
+    if points:
+        latitudes, longitudes = np.array(points, dtype=np.float64).T
+        if args.radius is not None:
+            for p, (positions, distances) in enumerate(index.within(latitudes, longitudes, args.radius, mask)):
+                results.extend(zip([p] * len(positions), range(len(positions)), positions, distances))
+        else:
+            positions, distances = index.nearest(latitudes, longitudes, args.k, mask)
+            for p in range(len(points)):
+                results.extend(
+                    (p, rank, i, d) for rank, (i, d) in enumerate(zip(positions[p], distances[p])) if i >= 0
+                )
+
+    table = index.table
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["point", "rank", "distance_km", "icao", "name", "latitude", "longitude", "status", "length", "width"])
+    for p, rank, i, distance in results:
+        writer.writerow([
+            "" if p is None else p, rank, "" if distance is None else round(float(distance), 3),
+            "" if table.icao is None else table.icao[i], table.name[i],
+            table.latitude[i], table.longitude[i], table.status[i],
+            *("" if np.isnan(size) else size for size in (table.length[i], table.width[i])),
+        ])
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["query"]:
+        sys.exit(query(sys.argv[2:]))
+
     parser = argparse.ArgumentParser()
-    parser.add_argument("in_paths", nargs='+', help="Input airstrip files")
+    parser.add_argument("in_paths", nargs='*', help="Input airstrip files")
     parser.add_argument("--out", dest="out_path", help="Output airstrips file")
     parser.add_argument("--logic", dest="logic", default=DEFAULT_LOGIC, help="Which logic class to call")
+    parser.add_argument("--regions", dest="regions_path", help="YAML file of regions: parse once and write one output per region, named after --out with the region code")
+    parser.add_argument("--format", dest="formats", default="kml", help="Comma separated output formats: kml, kmz, geojson, gpx, csv, snapshot (for --from-snapshot and airstripmap.py query). The format with the extension of --out, or a single format, is written to --out, the others to its path with their own extension")
+    parser.add_argument("--precision", dest="precision", type=int, help="Round coordinates to this many decimals, streamed KML and KMZ also leave out zero altitudes (default: full precision, 6 for kmz)")
+    parser.add_argument("--engine", dest="engine", default="join", choices=["join", "loop"], help="Which map engine to use")
+    parser.add_argument("--writer", dest="writer", default="simplekml", choices=["simplekml", "stream", "tiles"], help="Which KML writer to use")
+    parser.add_argument("--jobs", dest="jobs", type=int, default=1, help="Number of processes reading input files, writing tiles or writing regions")
+    parser.add_argument("--tile-size", dest="tile_size", type=int, help="Maximum placemarks per tile of the tiles writer")
+    parser.add_argument("--chunksize", dest="chunksize", type=int, help="Read input files in chunks of this many rows with bounded memory, without --jobs or the parse cache")
+    parser.add_argument("--pipeline", dest="pipeline", action="store_true", help="With --chunksize, overlap reading and mapping in threads; chunks are mapped per ICAO partition as they arrive, writing starts once all are mapped")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true", help="Always parse input files, bypassing the parse cache")
+    parser.add_argument("--cache-dir", dest="cache_dir", help="Parse cache directory (default: ~/.cache/airstripmap)")
+    parser.add_argument("--cache-size", dest="cache_size", type=int, default=256, help="Maximum parse cache size in MB")
+    parser.add_argument("--incremental", dest="incremental", action="store_true", help="Only regenerate airstrips whose input rows changed since the last run, written like the stream writer")
+    parser.add_argument("--delta", dest="delta_path", help="With --incremental, also write a KML update for the previous output")
+    parser.add_argument("--delta-href", dest="delta_href", help="Previous output URL targeted by the KML update (default: output file name)")
+    parser.add_argument("--match-distance", dest="match_distance", type=float, help="Merge rows without ICAO with rows of the other source within this many km and with a similar name")
+    parser.add_argument("--match-similarity", dest="match_similarity", type=float, default=0.8, help="With --match-distance, minimum name similarity from 0 to 1")
+    parser.add_argument("--match-report", dest="match_report_path", help="With --match-distance, write how every input row was matched to this CSV file")
+    parser.add_argument("--dem", dest="dem_dir", help="Directory of SRTM .hgt elevation tiles to fill in missing altitudes")
+    parser.add_argument("--dem-cache-size", dest="dem_cache_size", type=int, default=256, help="Maximum size of the memory mapped elevation tiles in MB")
+    parser.add_argument("--from-snapshot", dest="snapshot_path", help="Write the airstrips of a snapshot instead of reading and mapping input files")
+    parser.add_argument("--rejects", dest="rejects_path", help="Write every skipped input row with its reason to this CSV file")
+    parser.add_argument("--metrics", dest="metrics_path", help="Write run metrics as JSON, or as Prometheus textfile for a .prom path")
+    parser.add_argument("--profile", dest="profile_dir", help="Profile every stage into this directory: pstats, collapsed stacks for flamegraphs and a printed summary")
+    parser.add_argument("--profile-top", dest="profile_top", type=int, default=10, help="Functions in the printed profile summary per stage")
+    parser.add_argument("--serve", dest="serve", action="store_true", help="Keep running: rebuild when the input files change and serve the latest KML and KMZ over HTTP")
+    parser.add_argument("--host", dest="host", default="", help="With --serve, address to listen on (default: all)")
+    parser.add_argument("--port", dest="port", type=int, default=8000, help="With --serve, port to listen on")
+    parser.add_argument("--watch-interval", dest="watch_interval", type=float, default=2., help="With --serve, seconds between checks of the input files")
     parser.add_argument("--log", dest="loglevel", default="ERROR", help="Set loglevel")
     args = parser.parse_args()
+    if not args.in_paths and not args.snapshot_path:
+        parser.error("the following arguments are required: in_paths")
+    if args.serve and args.snapshot_path:
+        parser.error("--serve watches input files, not a snapshot")
 
     setup_logging(path="logging.yaml", loglevel=args.loglevel)
     main(args)
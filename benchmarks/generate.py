@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Synthetic haja and wingman csv files for benchmarks.
+
+The rows mix all five coordinate formats and contain missing ICAOs,
+duplicate ICAOs, empty rows, closed strips and airstrips outside
+Madagascar, like the real exports do.
+"""
+
+import argparse
+import csv
+import random
+
+from pathlib import Path
+
+
+HAJA_KEYS = ["Name", "ICAO", "Latitude", "Longitude", "Open", "Usage"]
+WINGMAN_KEYS = ["Abbreviation", "Name", "ICAO", "Latitude", "Longitude", "Elev (ft)",
+    "Ctry", "Owner", "Avgas", "Jet", "Direction", "Class", "Surface",
+    "Length", "Width", "Comments", "Last Insp", "Freq (mths)", "Closed",
+    "Waypt. Only", "Dep. Tax"]
+
+SYLLABLES = ["am", "ba", "to", "ma", "ha", "ja", "nga", "tsi", "ra", "be", "no", "sy", "fia", "na", "ran", "vo"]
+# Madagascar
+SOUTH, NORTH = -25.6, -11.9
+WEST, EAST = 43.2, 50.5
+
+
+def name(rng):
+    words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 2))]
+    if rng.random() < 0.05:
+        words[-1] += "/" + rng.choice(SYLLABLES) * 2
+    return " ".join(word.upper() if rng.random() < 0.3 else word for word in words)
+
+def coordinate(rng, value, positive, negative):
+    direction = positive if value >= 0 else negative
+    value = abs(value)
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    seconds = (minutes - int(minutes)) * 60
+    kind = rng.randrange(5)
+    if kind == 0:  # hybrid 1
+        return "{} {} {} {:.1f}".format(direction, degrees, int(minutes), seconds)
+    if kind == 1:  # hybrid 2
+        return "{} {} {:.4f}".format(direction, degrees, minutes)
+    if kind == 2:  # DMS
+        return "{}°{}'{}\"{}".format(degrees, int(minutes), int(seconds), direction)
+    if kind == 3:  # DMM
+        return "{} {:.4f}".format(degrees, minutes)
+    return "{:.5f}".format(value)  # DD
+
+def icao(rng, n):
+    if rng.random() < 0.02:
+        return ""
+    # Drawing from n codes gives duplicates and overlap between the files
+    return "FM{:05d}".format(rng.randrange(n))
+
+def haja_row(rng, n):
+    return [
+        name(rng),
+        icao(rng, n),
+        coordinate(rng, rng.uniform(SOUTH, NORTH), "N", "S"),
+        coordinate(rng, rng.uniform(WEST, EAST), "E", "W"),
+        rng.choice(["Open"] * 8 + ["Closed", ""]),
+        rng.choice(["Public", "Private", "Mission", ""]),
+    ]
+
+def wingman_row(rng, n):
+    row = dict.fromkeys(WINGMAN_KEYS, "")
+    row.update({
+        "Abbreviation": "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(4)),
+        "Name": name(rng),
+        "ICAO": icao(rng, n),
+        "Latitude": coordinate(rng, rng.uniform(SOUTH, NORTH), "N", "S"),
+        "Longitude": coordinate(rng, rng.uniform(WEST, EAST), "E", "W"),
+        "Elev (ft)": rng.choice(["{}".format(rng.randint(0, 6000)), "{}ft".format(rng.randint(0, 6000)), "", "unknown"]),
+        "Ctry": rng.choice(["MG"] * 18 + ["KM", "MZ"]),
+        "Owner": rng.choice(["Government", "Private", "Mission", ""]),
+        "Class": rng.choice(["A", "B", "C", "D", ""]),
+        "Surface": rng.choice(["Grass", "Laterite", "Asphalt", ""]),
+        "Length": rng.choice(["{}m".format(rng.randint(400, 2500)), ""]),
+        "Width": rng.choice(["{}m".format(rng.randint(15, 45)), ""]),
+        "Comments": rng.choice(["", "Soft in rainy season", "Cattle on strip, overfly first"]),
+        "Last Insp": rng.choice(["", "{}-{:02d}-{:02d}".format(rng.randint(2010, 2020), rng.randint(1, 12), rng.randint(1, 28))]),
+        "Closed": rng.choice(["No"] * 8 + ["Yes", ""]),
+    })
+    return [row[key] for key in WINGMAN_KEYS]
+
+def write(path, keys, make_row, rows, rng):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(keys)
+        for _ in range(rows):
+            if rng.random() < 0.01:  # Empty row
+                writer.writerow([""] * len(keys))
+            else:
+                writer.writerow(make_row(rng, rows))
+
+def generate(directory, rows, seed=0):
+    """Write haja.csv and wingman.csv with `rows` rows each, returns their paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    haja = directory / "haja.csv"
+    wingman = directory / "wingman.csv"
+    write(haja, HAJA_KEYS, haja_row, rows, rng)
+    write(wingman, WINGMAN_KEYS, wingman_row, rows, rng)
+    return haja, wingman
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per file")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("out_dir", help="Output directory")
+    args = parser.parse_args()
+
+    for path in generate(args.out_dir, args.rows, args.seed):
+        print(path)
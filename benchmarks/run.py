@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""Time and memory-profile the read, map and write stages.
+
+Every stage runs `--repeat` times on generated data and the fastest run
+is kept, the peak traced memory is measured in an extra run. Results are
+saved as JSON and can be compared with an earlier run:
+
+    $ python benchmarks/run.py --rows 1000 10000 --out results.json
+    $ python benchmarks/run.py --rows 1000 10000 --compare results.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import generate  # noqa: E402
+import logic  # noqa: E402
+
+
+def stages(in_paths, out_path, options):
+    """Return (stage, callable) pairs, each callable runs a stage once."""
+    instance = logic.HajaWingmanLogic([], out_path, **options)
+    state = {}
+
+    def read():
+        instance.in_paths = [str(path) for path in in_paths]
+        state["raw"] = instance.read()
+
+    def map_():
+        state["airstrips"] = instance.map(state["raw"])
+
+    def write():
+        instance.write(state["airstrips"])
+
+    return [("read", read), ("map", map_), ("write", write)]
+
+def measure(function, repeat):
+    seconds = min(_timed(function) for _ in range(repeat))
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+def _timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def run(rows, repeat, options):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="airstripmap-bench-") as directory:
+        for n in rows:
+            in_paths = generate.generate(Path(directory) / str(n), n)
+            out_path = str(Path(directory) / "{}.kml".format(n))
+            for stage, function in stages(in_paths, out_path, options):
+                seconds, peak = measure(function, repeat)
+                results.append(dict(rows=n, stage=stage, seconds=seconds, peak_bytes=peak))
+                print("{:>9} rows  {:<6} {:9.3f}s {:10.1f} MB".format(n, stage, seconds, peak / 1e6))
+    return results
+
+def metadata(options):
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        revision = None
+    import numpy
+    import pandas
+    return dict(
+        revision=revision,
+        python=platform.python_version(),
+        numpy=numpy.__version__,
+        pandas=pandas.__version__,
+        machine=platform.machine(),
+        options=options,
+    )
+
+def compare(results, baseline, threshold):
+    """Print the change per stage, returns the regressions beyond `threshold`."""
+    before = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result["rows"], result["stage"]))
+        if old is None:
+            continue
+        change = result["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.
+        memory = result["peak_bytes"] / old["peak_bytes"] - 1 if old["peak_bytes"] else 0.
+        print("{:>9} rows  {:<6} time {:+7.1%}  memory {:+7.1%}".format(
+            result["rows"], result["stage"], change, memory
+        ))
+        if change > threshold or memory > threshold:
+            regressions.append(result)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs='+', default=[1000, 10000, 100000], help="Rows per input file, up to 1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--engine", default="join", choices=["join", "loop"], help="Map engine")
+    parser.add_argument("--writer", default="stream", choices=["simplekml", "stream"], help="KML writer")
+    parser.add_argument("--out", dest="out_path", help="Save results as JSON")
+    parser.add_argument("--compare", dest="baseline", help="Compare with earlier JSON results")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as regression")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    options = dict(engine=args.engine, writer=args.writer)
+    results = run(args.rows, args.repeat, options)
+
+    if args.out_path:
+        with open(args.out_path, 'w') as f:
+            json.dump(dict(meta=metadata(options), results=results), f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("{} regression(s) beyond {:.0%}".format(len(regressions), args.threshold))
+            sys.exit(1)
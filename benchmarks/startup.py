@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Time the startup of the CLI in fresh interpreters.
+
+Measures `airstripmap.py --help`, which should not import any heavy
+dependency, and loading a logic class, which imports what running it
+needs. The slowest imports of `--help` are listed from `-X importtime`:
+
+    $ python benchmarks/startup.py --repeat 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = [
+    ("help", ["airstripmap.py", "--help"]),
+    ("load logic", ["-c", "import logic; logic.HajaWingmanLogic"]),
+]
+
+
+def timed(arguments):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def slowest_imports(arguments, top):
+    """Modules with the largest cumulative import time, in microseconds."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime"] + arguments,
+        cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if cumulative.strip().isdigit():
+            # Only top level imports, nested ones are part of their parent
+            if not name.startswith("  "):
+                modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command, the fastest is kept")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports of --help to list")
+    parser.add_argument("--out", dest="out_path", help="Save results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for name, arguments in COMMANDS:
+        seconds = min(timed(arguments) for _ in range(args.repeat))
+        results.append(dict(command=name, seconds=seconds))
+        print("{:<12} {:8.3f}s".format(name, seconds))
+
+    print("Slowest imports of --help:")
+    for microseconds, module in slowest_imports(COMMANDS[0][1], args.top):
+        print("  {:<30} {:8.3f}s".format(module, microseconds / 1e6))
+
+    if args.out_path:
+        with open(args.out_path, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -1,3 +1,12 @@
+COUNTRY = "MG"
+COUNTRY_NAME = "Madagascar"
+BOUNDS = dict(
+    north=-11.63011499099052,
+    south=-26.04605302582592,
+    east=51.58283094574556,
+    west=42.72857522419672,
+)
+
 GOV_AIRPORTS = {
     "Antananarivo/Ivato": "big",
     "Antsiranana/Diego": "small",
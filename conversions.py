@@ -6,6 +6,9 @@ Reference: https://support.google.com/maps/answer/18539
 import logging
 import re
 
+import numpy as np
+import pandas
+
 
 logger = logging.getLogger('cli')
 
@@ -24,6 +27,17 @@ hyb1_coords = re.compile(r"^[NESW] [\d]{1,2} [\d]{1,2} [\d]{1,2}(\.[\d]+)?, [NES
 # S 41 24.2028 W 2 10.4418
 hyb2_coord = re.compile(r"^[NESW] [\d]{1,3} [\d]{1,2}(\.[\d]+)?$")
 hyb2_coords = re.compile(r"^[NESW] [\d]{1,2} [\d]{1,2}(\.[\d]+)?, [NESW] [\d]{1,2} [\d]{1,3}(\.[\d]+)?$")
+# All single coordinate formats in `parse_coord` order, one named group per part
+any_coord = re.compile(
+    r"^(?:"
+    r"(?P<hyb1_dir>[NESW]) (?P<hyb1_deg>[\d]{1,3}) (?P<hyb1_min>[\d]{1,2}) (?P<hyb1_sec>[\d]{1,2}(?:\.[\d]+)?)"
+    r"|(?P<hyb2_dir>[NESW]) (?P<hyb2_deg>[\d]{1,3}) (?P<hyb2_min>[\d]{1,2}(?:\.[\d]+)?)"
+    r"|(?P<dms_deg>[\d]{1,2})°(?P<dms_min>[\d]{1,2})'(?P<dms_sec>[\d]{1,2})(?P<dms_frac>\.[\d]+)?\"(?P<dms_dir>[NESW])"
+    r"|(?P<dmm_deg>[\d]{1,2}) (?P<dmm_min>[\d]{1,2}(?:\.[\d]+)?)"
+    r"|(?P<dd>[\d]{1,2}.[\d]+)"
+    r")$"
+)
+COORD_FORMATS = ["hyb1", "hyb2", "dms", "dmm", "dd"]
 
 
 def dms2dd(degrees: str, minutes: str, seconds: str, direction: str) -> float:
@@ -128,7 +142,7 @@ def parse_coord(coord):
     elif dd_coord.match(coord):
         return parse_dd_part(coord)
     else:
-        logger.warning("Invalid coordinate format {}".format(coord))
+        logger.debug("Invalid coordinate format %s", coord)
         return None
 
 def parse_coords(coords):
@@ -143,8 +157,79 @@ def parse_coords(coords):
     elif dd_coords.match(coords):
         return parse_dd(coords)
     else:
-        logger.warning("Invalid coordinates format {}".format(coords))
+        logger.debug("Invalid coordinates format %s", coords)
         return None
 
+def _to_float(parts) -> np.ndarray:
+    values = np.asarray(parts, dtype=object)
+    try:
+        return values.astype(float)
+    except ValueError:
+        # The dd pattern accepts any separator, float() does not
+        result = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except ValueError:
+                pass
+        return result
+
+def _signed(dd: np.ndarray, direction) -> np.ndarray:
+    return np.where(np.isin(np.asarray(direction, dtype=object), ['S', 'W']), -dd, dd)
+
+def parse_coord_array(coords) -> (np.ndarray, dict):
+    """Parse a whole column of single coordinates at once.
+
+    Column-wise `parse_coord` for a pandas Series or NumPy array: every value
+    is matched once against all formats and the parts are converted per
+    format. Returns a float64 array, NaN where a coordinate is invalid, and
+    the number of hits per format (plus "invalid").
+    """
+    parts = pandas.Series(coords).astype(object).str.extract(any_coord)
+    coord = np.full(len(parts), np.nan)
+    hits = {}
+
+    hyb1 = parts.hyb1_dir.notna().to_numpy()
+    p = parts[hyb1]
+    coord[hyb1] = _signed(_to_float(p.hyb1_deg) + _to_float(p.hyb1_min)/60 + _to_float(p.hyb1_sec)/(60*60), p.hyb1_dir)
+    hits["hyb1"] = int(hyb1.sum())
+
+    hyb2 = parts.hyb2_dir.notna().to_numpy()
+    p = parts[hyb2]
+    coord[hyb2] = _signed(_to_float(p.hyb2_deg) + _to_float(p.hyb2_min)/60, p.hyb2_dir)
+    hits["hyb2"] = int(hyb2.sum())
+
+    dms = parts.dms_dir.notna().to_numpy()
+    p = parts[dms]
+    # Like `parse_dms_part`, fractional seconds are split off as the
+    # direction part, so they are dropped and the value stays positive.
+    direction = p.dms_dir.where(p.dms_frac.isna())
+    coord[dms] = _signed(_to_float(p.dms_deg) + _to_float(p.dms_min)/60 + _to_float(p.dms_sec)/(60*60), direction)
+    hits["dms"] = int(dms.sum())
+
+    dmm = parts.dmm_deg.notna().to_numpy()
+    p = parts[dmm]
+    coord[dmm] = _to_float(p.dmm_deg) + _to_float(p.dmm_min)/60
+    hits["dmm"] = int(dmm.sum())
+
+    dd = parts.dd.notna().to_numpy()
+    coord[dd] = _to_float(parts.dd[dd])
+    hits["dd"] = int(dd.sum())
+
+    hits["invalid"] = int(np.isnan(coord).sum())
+
+    return coord, hits
+
 def feet_to_meters(feet: float) -> float:
     return feet * 0.3048
+
+# Runway length or width, in metres unless given in feet
+distance = r"^\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>m|ft|')?\s*$"
+
+def parse_distance_array(values) -> np.ndarray:
+    """Parse distances like "1200m", "1200" or "3900ft" into metres, NaN if invalid."""
+    parts = pandas.Series(values, dtype=object).astype(str).str.lower().str.extract(distance)
+    metres = pandas.to_numeric(parts.value, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    feet = parts.unit.isin(["ft", "'"]).to_numpy()
+    metres[feet] = feet_to_meters(metres[feet])
+    return metres
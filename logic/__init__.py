@@ -1,3 +1,36 @@
-"""Logic engines."""
+"""Logic engines.
 
-from .haja_wingman import HajaWingmanLogic
+Logic classes are imported on first use, so the CLI starts without
+loading pandas, numpy or simplekml. A logic named `HajaWingman` is the
+class `HajaWingmanLogic` in the module `logic.haja_wingman`.
+"""
+
+import importlib
+import re
+
+
+def module_name(name):
+    """Module of the logic `name`, e.g. `haja_wingman` for `HajaWingman`."""
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+def load(name):
+    """Import and return the class of the logic `name`."""
+    try:
+        module = importlib.import_module("." + module_name(name), __name__)
+    except ModuleNotFoundError as e:
+        if e.name != "{}.{}".format(__name__, module_name(name)):
+            raise
+        raise ValueError('Unknown logic: {}'.format(name)) from None
+    try:
+        return getattr(module, "{}Logic".format(name))
+    except AttributeError:
+        raise ValueError('Unknown logic: {}'.format(name)) from None
+
+def __getattr__(attr):
+    # Keeps `logic.HajaWingmanLogic` working
+    if attr.endswith("Logic") and attr != "Logic":
+        try:
+            return load(attr[:-len("Logic")])
+        except ValueError:
+            pass
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, attr))
@@ -1,13 +1,39 @@
 """Airstrip data structures."""
 
+import heapq
+import json
 import locale
+import mmap
+import numpy as np
+import pandas
+import struct
 
-locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
+from itertools import repeat
+
+LOCALE = 'en_US.UTF-8'
+
+# Snapshot files: magic, version and header length, a JSON header of the
+# columns, then every column aligned for memory mapping. Column offsets
+# count from the first aligned byte after the header.
+SNAPSHOT_MAGIC = b"AIRSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PREFIX = struct.Struct("<8sII")
+SNAPSHOT_ALIGN = 64
+
+
+def setup_locale():
+    """Collate names in the locale the airstrips are sorted by."""
+    locale.setlocale(locale.LC_ALL, LOCALE)
+
+def _align(offset):
+    return -(-offset // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
 
 
 class Airstrip(object):
     """Airstrip storage container."""
 
+    __slots__ = ('name', 'description', 'latitude', 'longitude', 'altitude', 'status', 'icao')
+
     def __init__(self, name, latitude, longitude, **kwargs):
         self.name = name
         self.description = kwargs.get('description', "")
@@ -15,6 +41,7 @@ class Airstrip(object):
         self.longitude = longitude
         self.altitude = kwargs.get('altitude', 0.)
         self.status = kwargs.get('status', 'b')
+        self.icao = kwargs.get('icao')
 
     def __str__(self):
         return "{} {} {} {}m".format(self.name, self.latitude, self.longitude, self.altitude)
@@ -28,7 +55,8 @@ class Airstrip(object):
             dict(
                 description=self.description,
                 altitude=self.altitude,
-                status=self.status
+                status=self.status,
+                icao=self.icao,
             )
         )
 
@@ -49,3 +77,265 @@ class Airstrip(object):
 
     def __ge__(self, other):
         return (locale.strxfrm(self.name) >= locale.strxfrm(other.name))
+
+
+class StringHeap(object):
+    """Strings stored as one UTF-8 buffer plus start and end offsets.
+
+    Reordering only permutes the offsets, the buffer is shared. The buffer
+    is bytes or any object slicing to bytes, such as a memory map.
+    """
+
+    __slots__ = ('buffer', 'starts', 'ends')
+
+    def __init__(self, buffer, starts, ends):
+        self.buffer = buffer
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        ends = np.cumsum(lengths)
+        return cls(b"".join(encoded), ends - lengths, ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return str(self.buffer[self.starts[i]:self.ends[i]], 'utf-8')
+
+    def __iter__(self):
+        buffer = self.buffer
+        for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+            yield str(buffer[start:end], 'utf-8')
+
+    def take(self, indices):
+        return StringHeap(self.buffer, self.starts[indices], self.ends[indices])
+
+    @classmethod
+    def concat(cls, heaps):
+        starts, ends, offset = [], [], 0
+        for heap in heaps:
+            starts.append(heap.starts + offset)
+            ends.append(heap.ends + offset)
+            offset += len(heap.buffer)
+        return cls(
+            b"".join(heap.buffer for heap in heaps),
+            np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64),
+            np.concatenate(ends) if ends else np.zeros(0, dtype=np.int64),
+        )
+
+
+class AirstripTable(object):
+    """Column storage for many airstrips.
+
+    Coordinates, altitudes and runway lengths and widths in metres are
+    float64 arrays, the status is categorical and names and descriptions
+    live in string heaps. Iterating yields `Airstrip` views for code that
+    works with single airstrips.
+    """
+
+    STATUSES = ['a', 'b', 'c', 'x']
+    HEAPS = ['name', 'description', 'icao']
+    ARRAYS = ['latitude', 'longitude', 'altitude', 'length', 'width']
+
+    def __init__(self, name, description, latitude, longitude, altitude, status, icao=None, length=None, width=None):
+        self.name = name if isinstance(name, StringHeap) else StringHeap.from_strings(name)
+        self.description = (description if isinstance(description, StringHeap)
+                            else StringHeap.from_strings(description))
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.altitude = np.asarray(altitude, dtype=np.float64)
+        self.status = pandas.Categorical(status, categories=self.STATUSES)
+        self.icao = icao if icao is None or isinstance(icao, StringHeap) else StringHeap.from_strings(icao)
+        # Unknown runway dimensions are NaN
+        self.length = np.full(len(self.latitude), np.nan) if length is None else np.asarray(length, dtype=np.float64)
+        self.width = np.full(len(self.latitude), np.nan) if width is None else np.asarray(width, dtype=np.float64)
+
+    @classmethod
+    def from_airstrips(cls, airstrips):
+        airstrips = list(airstrips)
+        icao = [a.icao for a in airstrips]
+        return cls(
+            name=[a.name for a in airstrips],
+            description=[a.description for a in airstrips],
+            latitude=[a.latitude for a in airstrips],
+            longitude=[a.longitude for a in airstrips],
+            altitude=[a.altitude for a in airstrips],
+            status=[a.status for a in airstrips],
+            icao=None if None in icao else icao,
+        )
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def __getitem__(self, i):
+        return Airstrip(
+            name=self.name[i],
+            description=self.description[i],
+            latitude=float(self.latitude[i]),
+            longitude=float(self.longitude[i]),
+            altitude=float(self.altitude[i]),
+            status=self.status[i],
+            icao=None if self.icao is None else self.icao[i],
+        )
+
+    def __iter__(self):
+        icaos = repeat(None) if self.icao is None else iter(self.icao)
+        for (name, description, latitude, longitude, altitude, status), icao in zip(self.rows(), icaos):
+            yield Airstrip(
+                name=name,
+                description=description,
+                latitude=latitude,
+                longitude=longitude,
+                altitude=altitude,
+                status=status,
+                icao=icao,
+            )
+
+    def rows(self):
+        """Iterate over plain (name, description, latitude, longitude, altitude, status) tuples."""
+        return zip(
+            self.name,
+            self.description,
+            self.latitude.tolist(),
+            self.longitude.tolist(),
+            self.altitude.tolist(),
+            self.status.astype(object),
+        )
+
+    def take(self, indices):
+        return AirstripTable(
+            name=self.name.take(indices),
+            description=self.description.take(indices),
+            latitude=self.latitude[indices],
+            longitude=self.longitude[indices],
+            altitude=self.altitude[indices],
+            status=self.status.take(indices),
+            icao=None if self.icao is None else self.icao.take(indices),
+            length=self.length[indices],
+            width=self.width[indices],
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        tables = list(tables)
+        with_icao = all(table.icao is not None for table in tables)
+        return cls(
+            name=StringHeap.concat([table.name for table in tables]),
+            description=StringHeap.concat([table.description for table in tables]),
+            latitude=np.concatenate([table.latitude for table in tables] or [[]]),
+            longitude=np.concatenate([table.longitude for table in tables] or [[]]),
+            altitude=np.concatenate([table.altitude for table in tables] or [[]]),
+            status=pandas.Categorical(
+                np.concatenate([table.status.astype(object) for table in tables] or [[]]),
+                categories=cls.STATUSES,
+            ),
+            icao=StringHeap.concat([table.icao for table in tables]) if with_icao else None,
+            length=np.concatenate([table.length for table in tables] or [[]]),
+            width=np.concatenate([table.width for table in tables] or [[]]),
+        )
+
+    def save(self, path):
+        """Save all columns to a snapshot file, which `load` maps into memory."""
+        columns = {key: getattr(self, key) for key in self.ARRAYS}
+        columns["status"] = self.status.codes
+        for key in self.HEAPS:
+            heap = getattr(self, key)
+            if heap is not None:
+                columns[key + "_buffer"] = np.frombuffer(heap.buffer, dtype=np.uint8)
+                columns[key + "_starts"] = heap.starts
+                columns[key + "_ends"] = heap.ends
+
+        layout, offset = {}, 0
+        for key, column in columns.items():
+            layout[key] = dict(dtype=column.dtype.str, length=len(column), offset=offset)
+            offset = _align(offset + column.nbytes)
+        header = json.dumps(dict(rows=len(self), columns=layout)).encode('utf-8')
+
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            start = _align(f.tell())
+            for key, column in columns.items():
+                f.write(b"\0" * (start + layout[key]["offset"] - f.tell()))
+                f.write(np.ascontiguousarray(column).data)
+
+    @classmethod
+    def load(cls, path):
+        """Map a snapshot file into memory, columns are read-only views of the file."""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size = SNAPSHOT_PREFIX.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError('Not an airstrip snapshot: {}'.format(path))
+        if version != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported snapshot version {}: {}'.format(version, path))
+        header = json.loads(buffer[SNAPSHOT_PREFIX.size:SNAPSHOT_PREFIX.size + size])
+        start = _align(SNAPSHOT_PREFIX.size + size)
+
+        data = {
+            key: np.frombuffer(buffer, dtype=column["dtype"], count=column["length"], offset=start + column["offset"])
+            for key, column in header["columns"].items()
+        }
+        heaps = {
+            key: StringHeap(data[key + "_buffer"].data, data[key + "_starts"], data[key + "_ends"])
+            for key in cls.HEAPS if key + "_buffer" in data
+        }
+        return cls(
+            status=pandas.Categorical.from_codes(data["status"], categories=cls.STATUSES),
+            **{key: data[key] for key in cls.ARRAYS},
+            **heaps,
+        )
+
+    def collation_keys(self):
+        return np.array([locale.strxfrm(name) for name in self.name], dtype=object)
+
+    def sorted(self):
+        """Return a copy sorted by name, computing each collation key once."""
+        return self.take(np.argsort(self.collation_keys(), kind='stable'))
+
+
+class MergedTables(object):
+    """Tables sorted by name and ICAO, merged lazily into one sorted stream.
+
+    Quacks like an `AirstripTable` for the writers: every iteration merges
+    the tables again, nothing is concatenated or sorted as a whole. The
+    collation keys are computed once per table.
+    """
+
+    def __init__(self, tables):
+        self.tables = list(tables)
+        self.keys = [table.collation_keys() for table in self.tables]
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables)
+
+    def _merged(self):
+        # ICAOs are unique, so the rows themselves are never compared
+        return heapq.merge(*(
+            zip(keys, table.icao, table.rows()) for keys, table in zip(self.keys, self.tables)
+        ))
+
+    def rows(self):
+        return (row for _, _, row in self._merged())
+
+    def table(self):
+        """All rows as one table, in the merged order."""
+        table = AirstripTable.concat(self.tables)
+        icaos = np.array(list(table.icao), dtype=object)
+        return table.take(np.argsort(icaos, kind='stable')).sorted()
+
+    def __iter__(self):
+        for _, icao, (name, description, latitude, longitude, altitude, status) in self._merged():
+            yield Airstrip(
+                name=name,
+                description=description,
+                latitude=latitude,
+                longitude=longitude,
+                altitude=altitude,
+                status=status,
+                icao=icao,
+            )
@@ -1,5 +1,17 @@
 """Logic base classes"""
 
+import heapq
+import logging
+
+from contextlib import ExitStack, contextmanager
+from .diagnostics import Diagnostics
+from .metrics import RunMetrics
+from .pipeline import threaded
+
+
+logger = logging.getLogger('cli')
+
+
 class Logic(object):
     """Base logic class, defines contracts for inheriting classes.
     
@@ -11,10 +23,25 @@ class Logic(object):
     1. Read input files and prepare them for stage 2
     2. Map values from input files to internal data structure and apply business logic
     3. Write generated internal data structure from stage 2 to output
+
+    With `pipeline`, reading and mapping overlap: `read_chunks` yields
+    independent parts of the input from a background thread, each is mapped
+    by `map_chunk` as it arrives and `merge` combines the sorted results for
+    `write`. Writing starts once every part is mapped, as the first row of
+    the merged order may be in the last part. By default the whole input is
+    one part, which is the sequential contract above.
     """
-    def __init__(self, in_paths, out_path):
+    def __init__(self, in_paths, out_path, **kwargs):
         self.in_paths = in_paths
         self.out_path = out_path
+        self.metrics = RunMetrics()
+        self.metrics_path = kwargs.get('metrics_path')
+        self.diagnostics = Diagnostics(self.metrics.counts, kwargs.get('rejects_path'))
+        self.pipeline = kwargs.get('pipeline', False)
+        self.profiler = None
+        if kwargs.get('profile_dir'):
+            from .profiling import DEFAULT_TOP, StageProfiler
+            self.profiler = StageProfiler(kwargs['profile_dir'], kwargs.get('profile_top') or DEFAULT_TOP)
 
     def read(self):
         raise NotImplementedError
@@ -25,5 +52,54 @@ class Logic(object):
     def write(self, airstrips):
         raise NotImplementedError
 
+    def read_chunks(self):
+        yield self.read()
+
+    def map_chunk(self, chunk):
+        return self.map(chunk)
+
+    def merge(self, mapped):
+        """Merge the mapped chunks, each sorted by name."""
+        if len(mapped) == 1:
+            return mapped[0]
+        return list(heapq.merge(*mapped))
+
     def run(self):
-        return self.write(self.map(self.read()))
+        if self.pipeline:
+            return self.run_pipelined()
+        with self.stage("read"):
+            raw = self.read()
+        with self.stage("map"):
+            airstrips = self.map(raw)
+        with self.stage("write"):
+            written = self.write(airstrips)
+        return self.finish(written)
+
+    def run_pipelined(self):
+        with self.stage("read_map"):
+            mapped = [self.map_chunk(chunk) for chunk in threaded(self.read_chunks())]
+        with self.stage("write"):
+            written = self.write(self.merge(mapped))
+        return self.finish(written)
+
+    @contextmanager
+    def stage(self, name):
+        """Measure, and with a profiler profile, one stage."""
+        with ExitStack() as stack:
+            stack.enter_context(self.metrics.stage(name))
+            if self.profiler is not None:
+                stack.enter_context(self.profiler.stage(name))
+            yield
+
+    def finish(self, written):
+        """Record the number of written airstrips, summarise rejected rows and
+        export the run metrics."""
+        if written is not None:
+            self.metrics.counts["rows_written"] = written
+        self.diagnostics.close()
+        for line in self.diagnostics.summary():
+            logger.warning(line)
+            print(line)
+        if self.metrics_path:
+            self.metrics.save(self.metrics_path)
+        return self.metrics
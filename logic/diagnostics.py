@@ -0,0 +1,70 @@
+"""Rejected rows, counted per reason instead of logged one by one."""
+
+import csv
+import logging
+
+from itertools import islice, repeat
+
+
+logger = logging.getLogger('cli')
+
+# ICAOs kept per reason for the summary
+SAMPLE_SIZE = 5
+REASONS = {
+    "skipped_outside": "outside the region",
+    "invalid_required": "missing name or coordinates",
+    "invalid_coordinates": "unparseable coordinates",
+}
+FIELDS = ["reason", "icao", "name", "latitude", "longitude", "country"]
+
+
+class Diagnostics(object):
+    """Counts rejected rows per reason and keeps a few ICAOs of each.
+
+    Counts go into `counts`, usually the run metrics. With `rejects_path`,
+    every rejected row is also written to a CSV file. Nothing is formatted
+    until the summary or the reject file needs it.
+    """
+
+    def __init__(self, counts, rejects_path=None):
+        self.counts = counts
+        self.samples = {reason: [] for reason in REASONS}
+        self.rejects_path = rejects_path
+        self._file = None
+        self._writer = None
+
+    def reject(self, reason, icaos, **details):
+        """Reject the rows of `icaos`, `details` are columns of the same length."""
+        icaos = list(icaos)
+        if not icaos:
+            return
+        self.counts[reason] += len(icaos)
+        sample = self.samples[reason]
+        sample.extend(islice(icaos, SAMPLE_SIZE - len(sample)))
+        if self.rejects_path is not None:
+            columns = [details.get(field, repeat("")) for field in FIELDS[2:]]
+            self.writer().writerows(zip(repeat(reason), icaos, *columns))
+
+    def writer(self):
+        if self._writer is None:
+            self._file = open(self.rejects_path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(FIELDS)
+        return self._writer
+
+    def close(self):
+        if self.rejects_path is not None:
+            self.writer()
+            self._file.close()
+            self._file = self._writer = None
+
+    def summary(self):
+        """One line per reason with rejected rows."""
+        lines = []
+        for reason, description in REASONS.items():
+            if self.counts[reason]:
+                lines.append("{} row(s) skipped, {}: {}{}".format(
+                    self.counts[reason], description, ", ".join(map(str, self.samples[reason])),
+                    ", ..." if self.counts[reason] > len(self.samples[reason]) else "",
+                ))
+        return lines
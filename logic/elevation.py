@@ -0,0 +1,94 @@
+"""Elevations from local SRTM HGT tiles.
+
+A tile covers one degree square, named after its south west corner like
+N18E047.hgt, and holds big-endian int16 metres, rows from north to south.
+Tiles are memory mapped on first use and the least recently used ones
+are closed when the mapped tiles exceed the memory budget, so only the
+pages around looked up points are read.
+"""
+
+import logging
+import math
+import os
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+logger = logging.getLogger('cli')
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+VOID = -32768
+
+
+def tile_name(south, west):
+    return "{}{:02d}{}{:03d}.hgt".format(
+        "N" if south >= 0 else "S", abs(south), "E" if west >= 0 else "W", abs(west)
+    )
+
+
+class ElevationTiles(object):
+    """HGT tiles of a directory, memory mapped within `max_bytes`."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.missing = set()
+        self.opened = 0
+
+    def tile(self, south, west):
+        """The mapped tile with this south west corner, or None if there is no file."""
+        key = (south, west)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        if key in self.missing:
+            return None
+        path = os.path.join(self.directory, tile_name(south, west))
+        if not os.path.exists(path):
+            self.missing.add(key)
+            return None
+        size = math.isqrt(os.path.getsize(path) // 2)
+        tile = np.memmap(path, dtype='>i2', mode='r', shape=(size, size))
+        self.opened += 1
+        self.tiles[key] = tile
+        # Unmap the least recently used tiles, but never the one just opened
+        while len(self.tiles) > 1 and sum(t.nbytes for t in self.tiles.values()) > self.max_bytes:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def lookup(self, latitudes, longitudes):
+        """Bilinear elevations in metres of many points, NaN without a tile or on voids.
+
+        Points are grouped by tile, so every tile is looked up once per call.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        elevations = np.full(len(latitudes), np.nan)
+        known = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        south = np.floor(latitudes[known]).astype(np.int64)
+        west = np.floor(longitudes[known]).astype(np.int64)
+        corners, group = np.unique(np.stack([south, west], axis=1), axis=0, return_inverse=True)
+        order = np.argsort(group, kind='stable')
+        bounds = np.searchsorted(group[order], np.arange(len(corners) + 1))
+
+        for g, (s, w) in enumerate(corners.tolist()):
+            tile = self.tile(s, w)
+            if tile is None:
+                continue
+            points = known[order[bounds[g]:bounds[g + 1]]]
+            last = len(tile) - 1
+            # Fractional rows count down from the north edge
+            row = (s + 1 - latitudes[points]) * last
+            col = (longitudes[points] - w) * last
+            r = np.clip(np.floor(row).astype(np.int64), 0, last - 1)
+            c = np.clip(np.floor(col).astype(np.int64), 0, last - 1)
+            dr, dc = row - r, col - c
+            samples = [tile[r, c], tile[r, c + 1], tile[r + 1, c], tile[r + 1, c + 1]]
+            value = ((samples[0] * (1 - dc) + samples[1] * dc) * (1 - dr)
+                     + (samples[2] * (1 - dc) + samples[3] * dc) * dr)
+            void = np.any([sample == VOID for sample in samples], axis=0)
+            elevations[points] = np.where(void, np.nan, value)
+        return elevations
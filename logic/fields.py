@@ -0,0 +1,132 @@
+"""Declarative merge of any number of ICAO indexed sources.
+
+All sources are outer joined at once on their ICAO index, then every
+output field is resolved from the sources in its priority order. Another
+source adds one hash lookup per row and a column per field it feeds,
+not another code path.
+"""
+
+import functools
+
+import numpy as np
+import pandas
+
+
+def column_values(column, frame):
+    """Values of a column name or callable in `frame`, as a Series."""
+    values = column(frame) if callable(column) else frame[column]
+    if not isinstance(values, pandas.Series):
+        values = pandas.Series(values, index=frame.index)
+    return values
+
+
+class Joined(object):
+    """Sources reindexed to the union of their ICAOs.
+
+    `frames` holds every source with one row per ICAO, all NaN where the
+    source lacks the ICAO, and `present` the masks of the rows it has.
+    """
+
+    def __init__(self, index, frames, present):
+        self.index = index
+        self.frames = frames
+        self.present = present
+
+    @classmethod
+    def join(cls, sources):
+        """Outer join the frames of `sources`, a dict by source name, on their unique index."""
+        indices = [frame.index for frame in sources.values()]
+        index = functools.reduce(pandas.Index.union, indices[1:], indices[0]) if indices else pandas.Index([])
+        frames, present = {}, {}
+        for name, frame in sources.items():
+            positions = frame.index.get_indexer(index)
+            present[name] = positions >= 0
+            frames[name] = frame.reindex(index)
+        return cls(index, frames, present)
+
+    def __len__(self):
+        return len(self.index)
+
+    def take(self, mask):
+        return Joined(
+            self.index[mask],
+            {name: frame.iloc[mask] for name, frame in self.frames.items()},
+            {name: present[mask] for name, present in self.present.items()},
+        )
+
+
+class Column(object):
+    """Values of a source column passed through `convert`."""
+
+    def __init__(self, name, convert=None):
+        self.name = name
+        self.convert = convert
+
+    def __call__(self, frame):
+        values = frame[self.name]
+        return values if self.convert is None else self.convert(values)
+
+
+class Constant(object):
+    """The same value for every row of a source."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, frame):
+        return pandas.Series(self.value, index=frame.index, dtype=object)
+
+
+class When(object):
+    """`then`, or `then(value)` if callable, where a column is one of `values`, else missing."""
+
+    def __init__(self, column, values, then):
+        self.column = column
+        self.values = values
+        self.then = then
+
+    def __call__(self, frame):
+        values = frame[self.column]
+        matches = values.isin(self.values)
+        if callable(self.then):
+            return values.astype(object).where(matches).map(self.then, na_action='ignore')
+        return pandas.Series(self.then, index=frame.index, dtype=object).where(matches)
+
+
+class Field(object):
+    """An output field taken from the first source in priority order which has the row.
+
+    `sources` are (source name, column) pairs, the column a name or a
+    callable of the source frame, such as `Column` or `When`. With
+    `skip_missing`, a source whose value is missing does not decide
+    either. Rows no source decides get `default`.
+    """
+
+    def __init__(self, name, *sources, default=np.nan, skip_missing=False):
+        self.name = name
+        self.sources = sources
+        self.default = default
+        self.skip_missing = skip_missing
+
+    def values(self, source, frame):
+        """The values `source` gives in `frame`, from its first entry, or None."""
+        for name, column in self.sources:
+            if name == source:
+                return column_values(column, frame)
+        return None
+
+    def resolve(self, joined):
+        """Values of every joined row and the mask of the rows a source decided."""
+        values = pandas.Series(self.default, index=joined.index, dtype=object)
+        decided = np.zeros(len(joined), dtype=bool)
+        # The first source is applied last, so it wins
+        for source, column in reversed(self.sources):
+            if source not in joined.frames:
+                continue
+            value = column_values(column, joined.frames[source])
+            take = joined.present[source]
+            if self.skip_missing:
+                take = take & value.notna().to_numpy()
+            values = values.mask(take, value)
+            decided |= take
+        return values, decided
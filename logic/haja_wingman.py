@@ -3,19 +3,33 @@
 import logging
 import math
 import numpy as np
+import os
+import pandas
+import pickle
+import tempfile
+import time
 
 import conversions
 import readers
+import regions
 import writers
+import writers.kml.tiles
 
 from collections import defaultdict
-from pathlib import PurePath
-from .airstrip import Airstrip
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path, PurePath
+from . import elevation, incremental, matching
+from .airstrip import Airstrip, AirstripTable, MergedTables, setup_locale
 from .base import Logic
+from .fields import Column, Constant, Field, Joined, When
+from .pipeline import threaded
 
 
 logger = logging.getLogger('cli')
 
+# Input bytes per spill partition when mapping in chunks
+SPILL_PARTITION_BYTES = 64 * 1024 * 1024
+
 
 def build_description(icao, h, w):
     meta = defaultdict(str, {
@@ -73,6 +87,77 @@ def build_altitude(altitude):
 
     return altitude
 
+def build_name(name):
+    words = [word.capitalize() for word in name.split(' ')]
+    words = map(lambda x: '/'.join([w.capitalize() for w in x.split('/')]), words)
+    return ' '.join(words)
+
+def build_altitudes(altitudes, missing=0.):
+    """Column-wise `build_altitude`, with `missing` for unparseable altitudes."""
+    if pandas.api.types.is_numeric_dtype(altitudes):
+        return altitudes.astype(float).fillna(missing)
+    stripped = altitudes.str.strip('ft')
+    values = pandas.to_numeric(stripped, errors='coerce')
+    # Fall back to float() for the few values pandas refuses but python accepts
+    retry = values.isna() & altitudes.notna()
+    if retry.any():
+        values[retry] = stripped[retry].map(lambda altitude: _float_or(altitude, missing))
+    return values.fillna(missing)
+
+def _float_or(value, missing):
+    try:
+        return float(value)
+    except ValueError:
+        return missing
+
+def _altitudes_or_nan(altitudes):
+    return build_altitudes(altitudes, np.nan)
+
+def _as_text(column):
+    """Format a column the same way `str.format` formats a single value."""
+    return column.astype(object).map(str)
+
+def _text_or_dash(column):
+    return _as_text(column.where(column.map(lambda v: isinstance(v, str)), "-"))
+
+def unkeyed_id(source, row):
+    """Stand-in ICAO of a row without one."""
+    return "{}-{}".format(source, row)
+
+def _distances(column):
+    return conversions.parse_distance_array(column)
+
+def format_size(size):
+    if size < 1024:
+        return "{} bytes".format(size)
+    if size < 1024 * 1024:
+        return "{:.1f} KB".format(size / 1024)
+    return "{:.1f} MB".format(size / 1024 / 1024)
+
+def by_name(airstrips):
+    """Sort a table by name, then ICAO."""
+    icaos = np.array(list(airstrips.icao), dtype=object)
+    return airstrips.take(np.argsort(icaos, kind='stable')).sorted()
+
+def region_path(out_path, region):
+    """`out_path` with `{region}` replaced by the region code, or the code appended to its stem."""
+    out_path = out_path or "airstrips.kml"
+    if "{region}" in out_path:
+        return out_path.format(region=region.code)
+    path = Path(out_path)
+    return str(path.with_name("{}-{}{}".format(path.stem, region.code, path.suffix)))
+
+def _write_region(logic_cls, options, region, out_path, airstrips):
+    regions.activate(region)
+    return logic_cls([], out_path, **dict(options, jobs=1)).write(airstrips)
+
+def _load_all(f):
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return
+
 
 class HajaWingmanLogic(Logic):
     """Logic implementing kml generation out of the haja and wingman csv files.
@@ -83,20 +168,138 @@ class HajaWingmanLogic(Logic):
                    +---> | READ | ---> |       MAP       | ---> | WRITE | --> airstrips.kml
                    |     +------+      | convert   merge |      +-------+
     wingman.csv ---+                   +-----------------+
+
+    The join engine merges the sources of all `readers` by the `fields`
+    and `description` rules below, another source only needs its reader
+    and its place in the priority order of the fields it feeds.
     """
     readers = [readers.csv.HajaReader, readers.csv.WingmanReader]
+    # Fields of the airstrips, each from the first source in priority order which has the row
+    fields = {
+        "name": Field("Name", ("haja", "Name"), ("wingman", "Name")),
+        "latitude": Field("Latitude", ("wingman", "Latitude"), ("haja", "Latitude")),
+        "longitude": Field("Longitude", ("wingman", "Longitude"), ("haja", "Longitude")),
+        "country": Field("Country", ("wingman", "Ctry")),
+        # Missing altitudes are NaN until backfilled or zeroed
+        "altitude": Field("Altitude", ("wingman", Column("Elev (ft)", _altitudes_or_nan))),
+        "length": Field("Length", ("wingman", Column("Length", _distances))),
+        "width": Field("Width", ("wingman", Column("Width", _distances))),
+        # The first rule which applies
+        "status": Field(
+            "Status",
+            ("haja", When("Open", ["Closed"], "x")),
+            ("wingman", When("Closed", ["Yes"], "x")),
+            ("wingman", When("Class", ["A", "B", "C"], str.lower)),
+            default="c",  # Conservative assumption
+            skip_missing=True,
+        ),
+    }
+    # Fields of the description after the ICAO, in order
+    description = [
+        Field(
+            "Closed",
+            ("haja", When("Open", ["Closed"], "Yes")),
+            ("wingman", Column("Closed", _as_text)),
+            ("haja", Constant("No")),
+            default="-",
+            skip_missing=True,
+        ),
+        Field("Class", ("wingman", Column("Class", _text_or_dash)), default="-"),
+        Field("Usage", ("haja", Column("Usage", _as_text)), default="-"),
+        Field("Surface", ("wingman", Column("Surface", _text_or_dash)), default="-"),
+        Field("Length", ("wingman", Column("Length", _text_or_dash)), default="-"),
+        Field("Width", ("wingman", Column("Width", _text_or_dash)), default="-"),
+        Field("last Inspection", ("wingman", Column("Last Insp", _text_or_dash)), default="-"),
+        Field("Owner", ("wingman", Column("Owner", _text_or_dash)), default="-"),
+        Field("Comments", ("wingman", Column("Comments", _text_or_dash)), default="-"),
+    ]
+    engines = ["join", "loop"]
+    kml_writers = ["simplekml", "stream", "tiles"]
+
+    def __init__(self, in_paths, out_path, **kwargs):
+        super().__init__(in_paths, out_path, **kwargs)
+        setup_locale()
+        self.options = kwargs
+        self.region = kwargs.get('region') or regions.DEFAULT
+        self.regions = kwargs.get('regions')
+        self.engine = kwargs.get('engine', "join")
+        if self.engine not in self.engines:
+            raise ValueError('Invalid map engine: {}'.format(self.engine))
+        self.writer = kwargs.get('writer', "simplekml")
+        if self.writer not in self.kml_writers:
+            raise ValueError('Invalid writer: {}'.format(self.writer))
+        self.formats = kwargs.get('formats') or ["kml"]
+        for name in self.formats:
+            writers.get(name)
+        self.precision = kwargs.get('precision')
+        self.jobs = kwargs.get('jobs', 1)
+        self.tile_size = kwargs.get('tile_size') or writers.kml.tiles.DEFAULT_TILE_SIZE
+        # A cache shared between runs, or a new parse cache
+        self.cache = kwargs.get('parse_cache')
+        if self.cache is None and kwargs.get('cache', False):
+            self.cache = readers.cache.ParseCache(
+                kwargs.get('cache_dir') or readers.cache.DEFAULT_DIRECTORY,
+                kwargs.get('cache_size') or readers.cache.DEFAULT_MAX_BYTES,
+            )
+        self.chunksize = kwargs.get('chunksize')
+        self.partitions = 1
+        self.incremental = kwargs.get('incremental', False)
+        if self.incremental and self.chunksize:
+            raise ValueError('Incremental builds need whole input files, not chunks')
+        if self.pipeline and not self.chunksize:
+            raise ValueError('Pipelined runs overlap reading and mapping of chunks, they need a chunk size')
+        if self.incremental and self.writer == "tiles":
+            raise ValueError('Incremental builds write a single KML file, not tiles')
+        if self.incremental and self.pipeline:
+            raise ValueError('Incremental builds do not run pipelined')
+        if self.incremental and self.formats != ["kml"]:
+            raise ValueError('Incremental builds only write KML')
+        if self.regions and (self.incremental or self.chunksize or self.pipeline or self.engine != "join"):
+            raise ValueError('Region batches map whole input files with the join engine')
+        # Match rows without ICAO by proximity and name within this many km
+        self.match_distance = kwargs.get('match_distance')
+        self.match_similarity = kwargs.get('match_similarity') or matching.DEFAULT_SIMILARITY
+        self.match_report_path = kwargs.get('match_report_path')
+        # Stand-in ICAOs of unmatched rows without one, shown as "-"
+        self.unkeyed_ids = set()
+        if self.match_distance is not None and (self.incremental or self.chunksize or self.engine != "join"):
+            raise ValueError('Matching by proximity maps whole input files with the join engine')
+        # Backfill missing altitudes from the elevation tiles of this directory
+        self.elevations = None
+        if kwargs.get('dem_dir'):
+            if self.incremental or self.engine != "join":
+                raise ValueError('Altitudes are backfilled by the join engine, not in incremental builds')
+            self.elevations = elevation.ElevationTiles(
+                kwargs['dem_dir'], kwargs.get('dem_cache_size') or elevation.DEFAULT_MAX_BYTES
+            )
+        self.snapshot_path = kwargs.get('snapshot_path')
+        if self.snapshot_path and (self.regions or self.incremental or self.chunksize or self.pipeline):
+            raise ValueError('A snapshot is written as is, without regions, incremental builds or chunks')
+        self.delta_path = kwargs.get('delta_path')
+        self.delta_href = kwargs.get('delta_href')
 
     def read(self):
         total_files = len(self.in_paths)
         read_files = 0
         raw = {}
+        pure_paths = []
         while len(self.in_paths) > 0:
-            pp = PurePath(self.in_paths.pop())
-            for reader in self.readers:
-                name, data = reader().read(pp)
-                if data is not None:
-                    raw[name] = data
-                    read_files += 1
+            pure_paths.append(PurePath(self.in_paths.pop()))
+        if self.chunksize:
+            # Parse lazily while mapping, spread over enough spill partitions
+            size = sum(os.path.getsize(pp) for pp in pure_paths)
+            self.partitions = max(1, -(-size // SPILL_PARTITION_BYTES))
+            results = (readers.csv.read_path_chunks(pp, self.readers, self.chunksize) for pp in pure_paths)
+        elif self.jobs > 1:
+            results = readers.pool.read_paths(pure_paths, self.readers, self.jobs, self.cache)
+        else:
+            results = (readers.csv.read_path(pp, self.readers, self.cache) for pp in pure_paths)
+        for name, data in results:
+            if data is not None:
+                raw[name] = data
+                read_files += 1
+                if not self.chunksize:
+                    self.metrics.counts["rows_read"] += len(data)
         # Logging
         out = "{} of {} file(s) read.".format(read_files, total_files)
         logger.info(out)
@@ -105,12 +308,23 @@ class HajaWingmanLogic(Logic):
         return raw
 
     def map(self, raw):
+        if self.chunksize:
+            return self.map_chunks(raw)
+        if self.engine == "loop":
+            return self.map_loop(raw)
+        return self.map_join(raw)
+
+    def map_loop(self, raw):
+        """Map airstrip by airstrip, looking up both sources per ICAO.
+
+        The reference implementation of the haja and wingman rules, other
+        sources are ignored.
+        """
         haja_df = raw['haja']
         wingman_df = raw['wingman']
 
         # Create a unique list of ICAOs
-        icaos = set(haja_df.index.tolist()) | set(wingman_df.index.tolist())
-        icaos.remove(np.nan)
+        icaos = set(haja_df.index.dropna().tolist()) | set(wingman_df.index.dropna().tolist())
 
         airstrips = []
         for icao in icaos:
@@ -119,8 +333,8 @@ class HajaWingmanLogic(Logic):
                 h = haja_df.loc[icao]
             if icao in wingman_df.index:
                 w = wingman_df.loc[icao]
-                if w.Ctry != "MG":  # Skip airstrips outside Madagascar
-                    logger.warning("{} is outside Madagascar, skipping...".format(icao))
+                if w.Ctry != self.region.code:  # Skip airstrips outside the region
+                    self.diagnostics.reject("skipped_outside", [icao], country=[w.Ctry])
                     continue
 
             if not (h is None or w is None):
@@ -168,24 +382,24 @@ class HajaWingmanLogic(Logic):
             # Skip if required values are invalid
             if (not name or latitude is None or longitude is None
                 or latitude is np.nan or longitude is np.nan):
-                logger.warning("{} has invalid required values, skipping...".format(icao))
-                logger.warning("{} required values: name={}, latitude={}, longitude={}".format(
-                    icao, name, latitude, longitude
-                ))
+                self.diagnostics.reject(
+                    "invalid_required", [icao], name=[name], latitude=[latitude], longitude=[longitude]
+                )
                 continue
 
             # Conversions
-            words = [word.capitalize() for word in name.split(' ')]
-            words = map(lambda x: '/'.join([w.capitalize() for w in x.split('/')]), words)
-            name = ' '.join(words)
+            raw_latitude, raw_longitude = latitude, longitude
             latitude = conversions.parse_coord(latitude.strip())
             longitude = conversions.parse_coord(longitude.strip())
             altitude = conversions.feet_to_meters(altitude)
 
             # Skip invalid coordinates
             if latitude is None or longitude is None:
-                logger.warning("{} has invalid coordinates: {}, {}, skipping...".format(icao, latitude, longitude))
+                self.diagnostics.reject(
+                    "invalid_coordinates", [icao], name=[name], latitude=[raw_latitude], longitude=[raw_longitude]
+                )
                 continue
+            name = build_name(name)
 
             airstrips.append(
                 Airstrip(
@@ -195,11 +409,403 @@ class HajaWingmanLogic(Logic):
                     longitude=longitude,
                     altitude=altitude,
                     status=status,
+                    icao=icao,
                 )
             )
 
         # Retun a airstrip instance list sorted by name
         return sorted(airstrips)
 
+    def map_join(self, raw):
+        """Map all airstrips at once on an outer join of all sources.
+
+        Produces the same airstrips as `map_loop`, but with whole-column
+        operations instead of per-ICAO `.loc` lookups.
+        """
+        joined = self.join(raw)
+
+        # Skip airstrips outside the region
+        country, known = self.fields["country"].resolve(joined)
+        outside = known & (country != self.region.code).to_numpy()
+        self.diagnostics.reject("skipped_outside", joined.index[outside], country=country[outside])
+        return self.map_joined(joined.take(~outside))
+
+    def join(self, raw):
+        """Outer join all sources on their ICAO index, skipping missing ICAOs.
+
+        With a match distance, missing ICAOs are filled in by `match_keys`
+        first.
+        """
+        if self.match_distance is not None:
+            raw = self.match_keys(raw)
+        return Joined.join({name: df[df.index.notna()] for name, df in raw.items()})
+
+    def match_keys(self, raw):
+        """All sources with the ICAOs of the rows matched by proximity and name.
+
+        Rows without ICAO, or with an ICAO no other source knows, are
+        matched across the sources. Matched rows share the ICAO of one of
+        them, rows without ICAO matching none keep an `unkeyed_id`.
+        """
+        # In the order of the readers, whatever the order of the input files
+        raw = {reader.NAME: raw[reader.NAME] for reader in self.readers if reader.NAME in raw}
+        known = pandas.concat([pandas.Series(df.index.dropna().unique()) for df in raw.values()])
+        shared = known[known.duplicated()].unique()
+        sources, rows, icaos, names, latitudes, longitudes = [], [], [], [], [], []
+        for source, frame in raw.items():
+            candidates = np.flatnonzero(~frame.index.isin(shared))
+            part = frame.iloc[candidates]
+            sources.append(np.full(len(candidates), source, dtype=object))
+            rows.append(candidates)
+            icaos.append(part.index.to_numpy(dtype=object))
+            for values, key in ((names, "name"), (latitudes, "latitude"), (longitudes, "longitude")):
+                column = self.fields[key].values(source, part)
+                if column is None:
+                    column = pandas.Series(np.nan, index=part.index, dtype=object)
+                values.append(column.to_numpy(dtype=object))
+        sources, rows, icaos, names, latitudes, longitudes = map(
+            np.concatenate, (sources, rows, icaos, names, latitudes, longitudes)
+        )
+        latitudes = conversions.parse_coord_array(pandas.Series(latitudes).str.strip())[0]
+        longitudes = conversions.parse_coord_array(pandas.Series(longitudes).str.strip())[0]
+        keyed = pandas.notna(icaos)
+
+        matches = matching.match(
+            sources, latitudes, longitudes, names, keyed, self.match_distance, self.match_similarity,
+        )
+        # A cluster takes the ICAO of its keyed row, else the id of its first row
+        own = np.where(keyed, icaos, [unkeyed_id(s, r + 1) for s, r in zip(sources, rows.tolist())])
+        icao_of_cluster = pandas.Series(icaos[keyed], index=matches.cluster[keyed]).groupby(level=0).first()
+        keys = pandas.Series(matches.cluster).map(icao_of_cluster)
+        unkeyed = keys.isna().to_numpy()
+        keys = keys.fillna(pandas.Series(own[matches.cluster])).to_numpy(dtype=object)
+        self.unkeyed_ids.update(keys[unkeyed])
+
+        matched = {}
+        for source, frame in raw.items():
+            index = frame.index.to_numpy(dtype=object).copy()
+            mine = sources == source
+            index[rows[mine]] = keys[mine]
+            matched[source] = frame.set_axis(pandas.Index(index, name=frame.index.name))
+
+        count = int(matches.matched.sum())
+        self.metrics.counts["matched_proximity"] += count
+        out = "{} row(s) matched by proximity and name, {} without ICAO unmatched.".format(
+            count, int((~keyed & ~matches.matched).sum()))
+        logger.info(out)
+        print(out)
+        if self.match_report_path:
+            self.write_match_report(raw, shared, sources, rows, icaos, names, keys, matches)
+        return matched
+
+    def write_match_report(self, raw, shared, sources, rows, icaos, names, keys, matches):
+        """CSV of how every input row was matched: by ICAO, by proximity or not at all."""
+        partner = matches.partner
+        has_partner = partner >= 0
+        report = [pandas.DataFrame({
+            "source": sources,
+            "row": rows + 1,
+            "icao": icaos,
+            "name": names,
+            "key": keys,
+            "method": np.where(has_partner, "proximity", "unmatched"),
+            "matched_source": np.where(has_partner, sources[partner], None),
+            "matched_row": pandas.Series(rows[partner] + 1, dtype="Int64").mask(~has_partner),
+            "distance_km": matches.distance.round(3),
+            "similarity": matches.similarity.round(3),
+        })]
+        for source, frame in raw.items():
+            # Rows with an ICAO of several sources
+            exact = np.flatnonzero(frame.index.isin(shared))
+            icao = frame.index[exact]
+            others = pandas.Series("", index=range(len(exact)), dtype=object)
+            for other, other_frame in raw.items():
+                if other != source:
+                    others = others.mask(icao.isin(other_frame.index), others + "+" + other)
+            name = self.fields["name"].values(source, frame.iloc[exact])
+            report.append(pandas.DataFrame({
+                "source": source,
+                "row": exact + 1,
+                "icao": icao.to_numpy(dtype=object),
+                "name": None if name is None else name.to_numpy(dtype=object),
+                "key": icao.to_numpy(dtype=object),
+                "method": "icao",
+                "matched_source": others.str[1:],
+            }))
+        report = pandas.concat(report, ignore_index=True).sort_values(["source", "row"], kind='stable')
+        report.to_csv(self.match_report_path, index=False)
+
+    def map_joined(self, joined):
+        """Validate, convert and build the airstrips of joined rows."""
+        name, _ = self.fields["name"].resolve(joined)
+        latitude, _ = self.fields["latitude"].resolve(joined)
+        longitude, _ = self.fields["longitude"].resolve(joined)
+
+        # Skip if required values are invalid
+        invalid = (name.isna() | (name == "") | latitude.isna() | longitude.isna()).to_numpy()
+        self.diagnostics.reject(
+            "invalid_required", joined.index[invalid],
+            name=name[invalid], latitude=latitude[invalid], longitude=longitude[invalid],
+        )
+        valid = ~invalid
+        joined = joined.take(valid)
+        name, latitude, longitude = name[valid], latitude[valid], longitude[valid]
+
+        # Conversions
+        raw_latitude, raw_longitude = latitude, longitude
+        latitude, hits = conversions.parse_coord_array(latitude.str.strip())
+        logger.debug("Latitude formats: %s", hits)
+        latitude = pandas.Series(latitude, index=joined.index)
+        longitude, hits = conversions.parse_coord_array(longitude.str.strip())
+        logger.debug("Longitude formats: %s", hits)
+        longitude = pandas.Series(longitude, index=joined.index)
+
+        # Skip invalid coordinates
+        invalid = (latitude.isna() | longitude.isna()).to_numpy()
+        self.diagnostics.reject(
+            "invalid_coordinates", joined.index[invalid],
+            name=name[invalid], latitude=raw_latitude[invalid], longitude=raw_longitude[invalid],
+        )
+        valid = ~invalid
+        joined = joined.take(valid)
+        name, latitude, longitude = name[valid], latitude[valid], longitude[valid]
+
+        name = name.map(build_name)
+        description = self.build_descriptions(joined)
+        values = {key: self.fields[key].resolve(joined)[0] for key in ("altitude", "status", "length", "width")}
+
+        airstrips = AirstripTable(
+            name=name.tolist(),
+            description=description.tolist(),
+            latitude=latitude.to_numpy(),
+            longitude=longitude.to_numpy(),
+            altitude=self.backfill_altitudes(
+                conversions.feet_to_meters(values["altitude"].astype(float)), latitude, longitude
+            ).to_numpy(),
+            status=values["status"].to_numpy(),
+            icao=joined.index.tolist(),
+            length=values["length"].to_numpy(dtype=np.float64),
+            width=values["width"].to_numpy(dtype=np.float64),
+        )
+
+        # Retun a airstrip table sorted by name
+        return airstrips.sorted()
+
+    def backfill_altitudes(self, altitude, latitude, longitude):
+        """Missing altitudes from the elevation tiles if there are any, else 0."""
+        if self.elevations is not None:
+            missing = altitude.isna().to_numpy()
+            filled = self.elevations.lookup(latitude.to_numpy()[missing], longitude.to_numpy()[missing])
+            altitude[missing] = filled
+            self.metrics.counts["altitudes_filled"] += int(np.isfinite(filled).sum())
+            logger.debug("Filled %d of %d missing altitudes, %d tile(s) opened",
+                         np.isfinite(filled).sum(), missing.sum(), self.elevations.opened)
+        return altitude.fillna(0.)
+
+    def build_descriptions(self, joined):
+        """Column-wise `build_description`: the ICAO, then every `description` field."""
+        icao = _as_text(joined.index.to_series())
+        description = "ICAO: " + icao.mask(icao.isin(self.unkeyed_ids), "-")
+        for field in self.description:
+            description = description + ", " + field.name + ": " + field.resolve(joined)[0]
+        return description
+
+    def map_chunks(self, raw):
+        """Map streams of DataFrame chunks with bounded memory.
+
+        Chunks are spilled to disk partitioned by ICAO hash, so all rows of
+        an ICAO end up in the same partition, which is then joined and
+        mapped on its own. Sorting by name and ICAO gives the same order as
+        mapping everything at once.
+        """
+        with tempfile.TemporaryDirectory(prefix="airstripmap-") as spill:
+            self.spill(raw, Path(spill))
+            tables = [self.map_join(part) for part in self.load_partitions(raw, Path(spill))]
+        return by_name(AirstripTable.concat(tables))
+
+    def spill(self, raw, spill):
+        for name, chunks in raw.items():
+            if self.pipeline:
+                # Parse the next chunk while this one is spilled
+                chunks = threaded(chunks)
+            files = [open(spill / "{}-{}.pkl".format(name, p), 'wb') for p in range(self.partitions)]
+            try:
+                for chunk in chunks:
+                    self.metrics.counts["rows_read"] += len(chunk)
+                    chunk = chunk[chunk.index.notna()]
+                    partition = pandas.util.hash_array(chunk.index.to_numpy(dtype=object)) % self.partitions
+                    for p, f in enumerate(files):
+                        pickle.dump(chunk[partition == p], f, protocol=5)
+            finally:
+                for f in files:
+                    f.close()
+
+    def load_partitions(self, raw, spill):
+        for p in range(self.partitions):
+            part = {}
+            for name in raw:
+                with open(spill / "{}-{}.pkl".format(name, p), 'rb') as f:
+                    part[name] = pandas.concat(_load_all(f))
+            yield part
+
+    def read_chunks(self):
+        """The spilled ICAO partitions of the chunked input."""
+        raw = self.read()
+        with tempfile.TemporaryDirectory(prefix="airstripmap-") as spill:
+            self.spill(raw, Path(spill))
+            yield from self.load_partitions(raw, Path(spill))
+
+    def map_chunk(self, chunk):
+        return by_name(self.map_join(chunk))
+
+    def merge(self, mapped):
+        if len(mapped) == 1:
+            return mapped[0]
+        return MergedTables(mapped)
+
+    def map_regions(self, raw):
+        """Map every region from one join, grouped by country.
+
+        Rows of no source with a country, such as those only found in
+        haja, belong to the region whose bounding box contains them.
+        """
+        joined = self.join(raw)
+        country, known = self.fields["country"].resolve(joined)
+        unknown = ~known
+        codes = country.to_numpy(dtype=object, copy=True)
+        codes[unknown] = self.locate_regions(joined.take(unknown))
+        country = pandas.Series(codes, index=country.index)
+
+        outside = ~country.isin([region.code for region in self.regions]).to_numpy()
+        self.diagnostics.reject("skipped_outside", joined.index[outside], country=country[outside])
+
+        groups = country[~outside].groupby(country[~outside]).indices
+        joined = joined.take(~outside)
+        tables = {}
+        for region in self.regions:
+            rows = groups.get(region.code, np.zeros(0, dtype=np.int64))
+            tables[region.code] = self.map_joined(joined.take(rows))
+        return tables
+
+    def locate_regions(self, joined):
+        """The code of the smallest region whose bounding box contains each row.
+
+        Rows outside every box get none. Rows without valid coordinates get
+        the first region, whose mapping rejects them as it would in a single
+        run.
+        """
+        latitude, _ = self.fields["latitude"].resolve(joined)
+        longitude, _ = self.fields["longitude"].resolve(joined)
+        latitude = conversions.parse_coord_array(latitude.str.strip())[0]
+        longitude = conversions.parse_coord_array(longitude.str.strip())[0]
+        assigned = np.isnan(latitude) | np.isnan(longitude)
+        codes = np.full(len(assigned), None, dtype=object)
+        codes[assigned] = self.regions[0].code
+        # Nested boxes, such as an island within the box of its neighbour, go to the inner one
+        for region in sorted(self.regions, key=lambda r: (r.north - r.south) * (r.east - r.west)):
+            inside = ~assigned & (
+                (latitude >= region.south) & (latitude <= region.north)
+                & (longitude >= region.west) & (longitude <= region.east)
+            )
+            codes[inside] = region.code
+            assigned |= inside
+        return codes
+
+    def run_regions(self):
+        """Read and map once, then write every region in its own worker process."""
+        with self.stage("read"):
+            raw = self.read()
+        with self.stage("map"):
+            tables = self.map_regions(raw)
+        with self.stage("write"):
+            workers = min(len(self.regions), self.jobs if self.jobs > 1 else os.cpu_count() or 1)
+            options = {key: value for key, value in self.options.items() if key not in ('regions', 'parse_cache')}
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        _write_region, type(self), options, region,
+                        region_path(self.out_path, region), tables[region.code],
+                    )
+                    for region in self.regions
+                ]
+                written = sum(future.result() for future in futures)
+        return self.finish(written)
+
+    def finish(self, written):
+        if self.elevations is not None:
+            out = "{} missing altitude(s) filled from elevation tiles.".format(self.metrics.counts["altitudes_filled"])
+            logger.info(out)
+            print(out)
+        return super().finish(written)
+
+    def run_snapshot(self):
+        """Write the airstrips of a snapshot, skipping the read and map stages."""
+        with self.stage("load"):
+            airstrips = AirstripTable.load(self.snapshot_path)
+        out = "Loaded {} airstrips from {}.".format(len(airstrips), self.snapshot_path)
+        logger.info(out)
+        print(out)
+        with self.stage("write"):
+            written = self.write(airstrips)
+        return self.finish(written)
+
+    def run(self):
+        if self.snapshot_path:
+            return self.run_snapshot()
+        if self.regions:
+            return self.run_regions()
+        if not self.incremental:
+            return super().run()
+        with self.stage("read"):
+            raw = self.read()
+        with self.stage("rebuild"):
+            written = incremental.rebuild(self, raw, self.delta_path, self.delta_href)
+        return self.finish(written)
+
     def write(self, airstrips):
-        return writers.kml.write(airstrips, self.out_path)
+        """Write all formats from the same airstrips, concurrently if there are several."""
+        paths = self.format_paths()
+        if len(self.formats) == 1:
+            return self.write_format(self.formats[0], airstrips, paths[0])
+        with ThreadPoolExecutor(max_workers=len(self.formats)) as executor:
+            futures = [
+                executor.submit(self.write_format, name, airstrips, path)
+                for name, path in zip(self.formats, paths)
+            ]
+            counts = [future.result() for future in futures]
+        return counts[0]
+
+    def format_paths(self):
+        """The output path for the format with its extension, or for a single
+        format unless it has the extension of another one, and the output
+        path with their own extension for the others."""
+        extensions = [writers.get(name).extension for name in self.formats]
+        base = Path(self.out_path or "airstrips")
+        paths = [str(base.with_suffix(extension)) for extension in extensions]
+        others = {format.extension for format in writers.FORMATS.values()} - set(extensions)
+        if self.out_path and base.suffix in extensions:
+            paths[extensions.index(base.suffix)] = self.out_path
+        elif self.out_path and len(extensions) == 1 and base.suffix not in others:
+            paths[0] = self.out_path
+        return paths
+
+    def write_format(self, name, airstrips, path):
+        start = time.perf_counter()
+        if name == "kml":
+            count = self.write_kml(airstrips, path)
+        elif name == "kmz" and self.precision is None:
+            count = writers.get(name).write(airstrips, path)
+        else:
+            count = writers.get(name).write(airstrips, path, self.precision)
+        seconds = time.perf_counter() - start
+        out = "Wrote {} in {:.2f}s, {}.".format(path, seconds, format_size(os.path.getsize(path)))
+        logger.info(out)
+        print(out)
+        return count
+
+    def write_kml(self, airstrips, path):
+        if self.writer == "stream":
+            return writers.kml.write_stream(airstrips, path, self.precision)
+        if self.writer == "tiles":
+            return writers.kml.tiles.write(airstrips, path, self.tile_size, self.jobs, self.precision)
+        return writers.kml.write(airstrips, path, self.precision)
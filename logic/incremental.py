@@ -0,0 +1,173 @@
+"""Incremental rebuilds of the KML output.
+
+A manifest next to the output remembers, per ICAO, a hash of the source
+rows, a hash of the mapped airstrip and where its placemark sits in the
+output. The next run only maps and serialises ICAOs whose source rows
+changed and copies all other placemarks from the previous output.
+Placemarks are serialised like the stream writer does, with another
+coordinate precision than the previous run everything is rebuilt.
+"""
+
+import hashlib
+import html
+import json
+import locale
+import logging
+import os
+import pandas
+
+import writers
+
+from pathlib import Path
+
+
+logger = logging.getLogger('cli')
+
+MANIFEST_VERSION = 2
+DOCUMENT_ID = "airstrips"
+
+
+def manifest_path(out_path):
+    return Path(str(out_path) + ".manifest.json")
+
+def source_hashes(raw):
+    """Hash all source rows of every ICAO into one string per ICAO."""
+    columns = []
+    for name in sorted(raw):
+        df = raw[name]
+        df = df[df.index.notna()]
+        columns.append(pandas.util.hash_pandas_object(df, index=False).astype(str).rename(name))
+    hashes = pandas.concat(columns, axis=1).fillna("-")  # Outer join on ICAO
+    combined = hashes.iloc[:, 0]
+    for name in hashes.columns[1:]:
+        combined = combined + ":" + hashes[name]
+    return combined
+
+def airstrip_hash(airstrip):
+    fields = (airstrip.name, airstrip.description, airstrip.latitude,
+              airstrip.longitude, airstrip.altitude, airstrip.status)
+    return hashlib.sha1(repr(fields).encode('utf-8')).hexdigest()
+
+def load_manifest(out_path, precision=None):
+    """Load the manifest of the previous run, if it still matches its output
+    and coordinate precision."""
+    try:
+        with open(manifest_path(out_path), 'r') as f:
+            manifest = json.load(f)
+        size = os.path.getsize(out_path)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("size") != size
+            or manifest.get("precision") != precision):
+        logger.info("Manifest does not match {}, rebuilding everything".format(out_path))
+        return None
+    return manifest
+
+def write_delta(path, href, deleted, created):
+    """Write a NetworkLinkControl document updating the previous output."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(writers.kml.KML_HEADER)
+        f.write("<NetworkLinkControl>\n<Update>\n")
+        f.write("<targetHref>{}</targetHref>\n".format(html.escape(href)))
+        if deleted:
+            f.write("<Delete>\n")
+            for icao in deleted:
+                f.write('<Placemark targetId="{}"/>\n'.format(html.escape(icao)))
+            f.write("</Delete>\n")
+        if created:
+            f.write('<Create>\n<Document targetId="{}">\n'.format(DOCUMENT_ID))
+            f.writelines(created)
+            f.write("</Document>\n</Create>\n")
+        f.write("</Update>\n</NetworkLinkControl>\n")
+        f.write(writers.kml.KML_FOOTER)
+
+def rebuild(logic, raw, delta_path=None, delta_href=None):
+    """Map and write only what changed since the previous run of `logic`."""
+    out_path = logic.out_path
+    sources = source_hashes(raw)
+    manifest = load_manifest(out_path, logic.precision)
+    previous = manifest["airstrips"] if manifest else {}
+
+    previous_sources = pandas.Series(
+        {icao: entry["source"] for icao, entry in previous.items()}, dtype=object
+    ).reindex(sources.index)
+    changed = sources.index[sources != previous_sources]
+    removed = set(previous) - set(sources.index)
+
+    # Map only the changed airstrips
+    subset = {
+        name: df[df.index.isin(changed) | df.index.isna()]
+        for name, df in raw.items()
+    }
+    mapped = {airstrip.icao: airstrip for airstrip in logic.map(subset)}
+
+    # Collect placemarks, new ones serialised and unchanged ones spliced
+    # from the previous output, and keep their name for sorting
+    placemarks = []
+    airstrips = {}
+    created, deleted = [], []
+    with open(out_path if manifest else os.devnull, 'rb') as previous_output:
+        for icao, source in sources.items():
+            entry = previous.get(icao)
+            if icao not in mapped:
+                if entry is not None and entry["source"] == source and entry["offset"] is not None:
+                    previous_output.seek(entry["offset"])
+                    fragment = previous_output.read(entry["length"])
+                    placemarks.append((entry["name"], icao, fragment))
+                    airstrips[icao] = dict(entry)
+                    continue
+                # Skipped while mapping
+                airstrips[icao] = dict(source=source, airstrip=None, name=None)
+                if entry is not None and entry["offset"] is not None:
+                    deleted.append(icao)
+                continue
+
+            airstrip = mapped[icao]
+            fragment = writers.kml.placemark(
+                airstrip.name, airstrip.description, airstrip.latitude,
+                airstrip.longitude, airstrip.altitude, airstrip.status,
+                placemark_id=icao, precision=logic.precision,
+            )
+            digest = airstrip_hash(airstrip)
+            placemarks.append((airstrip.name, icao, fragment.encode('utf-8')))
+            airstrips[icao] = dict(source=source, airstrip=digest, name=airstrip.name)
+            if entry is None or entry["airstrip"] != digest:
+                if entry is not None and entry["offset"] is not None:
+                    deleted.append(icao)
+                created.append(fragment)
+    deleted.extend(icao for icao in sorted(removed) if previous[icao]["offset"] is not None)
+
+    # Same order as a full run: by name, then ICAO
+    placemarks.sort(key=lambda p: (locale.strxfrm(p[0]), p[1]))
+
+    tmp_path = Path(str(out_path) + ".tmp")
+    with open(tmp_path, 'wb', buffering=writers.kml.BUFFER_SIZE) as f:
+        f.write(writers.kml.KML_HEADER.encode('utf-8'))
+        f.write(writers.kml.document_header(DOCUMENT_ID).encode('utf-8'))
+        for name, icao, fragment in placemarks:
+            airstrips[icao].update(offset=f.tell(), length=len(fragment))
+            f.write(fragment)
+        f.write(b'</Document>\n')
+        f.write(writers.kml.KML_FOOTER.encode('utf-8'))
+        size = f.tell()
+    os.replace(tmp_path, out_path)
+
+    for entry in airstrips.values():
+        entry.setdefault("offset", None)
+        entry.setdefault("length", None)
+    with open(manifest_path(out_path), 'w') as f:
+        json.dump(dict(version=MANIFEST_VERSION, size=size, precision=logic.precision, airstrips=airstrips), f)
+
+    if delta_path is not None:
+        write_delta(delta_path, delta_href or Path(out_path).name, deleted, created)
+
+    out = "Re-mapped {} of {} ICAO(s), {} placemark(s) created or changed, {} deleted.".format(
+        len(changed), len(sources), len(created), len(deleted)
+    )
+    logger.info(out)
+    print(out)
+    out = "Generated KML file with {} airstrips.".format(len(placemarks))
+    logger.info(out)
+    print(out)
+
+    return len(placemarks)
@@ -0,0 +1,129 @@
+"""Spatial queries over mapped airstrips.
+
+Airstrips are kept as unit vectors, so the great-circle distance of many
+query points to all airstrips is one matrix product, computed in blocks
+to bound memory. For the few ten thousand airstrips of a country that is
+faster than walking a tree point by point.
+"""
+
+import numpy as np
+
+from .airstrip import AirstripTable
+
+
+EARTH_RADIUS_KM = 6371.0088
+# Matrix entries per block of a batch query
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def unit_vectors(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km, broadcasting like numpy."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0., 1.)))
+
+
+class AirstripIndex(object):
+    """Nearest, radius and bounding box queries over an `AirstripTable`.
+
+    Queries take arrays of points and return airstrip positions into
+    `table`, an optional boolean `mask` (see `select`) restricts them to
+    some airstrips.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.vectors = unit_vectors(table.latitude, table.longitude)
+
+    @classmethod
+    def load(cls, path):
+        return cls(AirstripTable.load(path))
+
+    def __len__(self):
+        return len(self.table)
+
+    def select(self, statuses=None, min_length=None, min_width=None):
+        """Mask of airstrips with one of `statuses` and at least the given runway size in metres."""
+        mask = np.ones(len(self), dtype=bool)
+        if statuses is not None:
+            mask &= np.isin(np.asarray(self.table.status.astype(object)), list(statuses))
+        # Unknown sizes (NaN) never qualify
+        if min_length is not None:
+            mask &= self.table.length >= min_length
+        if min_width is not None:
+            mask &= self.table.width >= min_width
+        return mask
+
+    def _candidates(self, mask):
+        if mask is None:
+            return np.arange(len(self)), self.vectors
+        candidates = np.flatnonzero(mask)
+        return candidates, self.vectors[candidates]
+
+    def _blocks(self, latitudes, longitudes, candidates):
+        """Yield (offset, cosine similarity block) of the query points against the candidates."""
+        points = unit_vectors(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        rows = max(1, BLOCK_SIZE // max(1, len(candidates)))
+        for offset in range(0, len(points), rows):
+            yield offset, points[offset:offset + rows] @ candidates.T
+
+    def nearest(self, latitudes, longitudes, k=1, mask=None):
+        """Positions and distances in km of the `k` nearest airstrips of every point.
+
+        Both arrays have the shape (points, k), nearest first. Missing
+        neighbours, with fewer than `k` candidates, are -1 and inf.
+        """
+        candidates, vectors = self._candidates(mask)
+        n = len(np.atleast_1d(latitudes))
+        indices = np.full((n, k), -1, dtype=np.int64)
+        distances = np.full((n, k), np.inf)
+        found = min(k, len(candidates))
+        if not found:
+            return indices, distances
+        for offset, similarity in self._blocks(latitudes, longitudes, vectors):
+            if found < len(candidates):
+                top = np.argpartition(-similarity, found - 1, axis=1)[:, :found]
+            else:
+                top = np.broadcast_to(np.arange(found), (len(similarity), found))
+            top_similarity = np.take_along_axis(similarity, top, axis=1)
+            order = np.argsort(-top_similarity, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_similarity = np.take_along_axis(top_similarity, order, axis=1)
+            block = slice(offset, offset + len(similarity))
+            indices[block, :found] = candidates[top]
+            distances[block, :found] = EARTH_RADIUS_KM * np.arccos(np.clip(top_similarity, -1., 1.))
+        return indices, distances
+
+    def within(self, latitudes, longitudes, radius_km, mask=None):
+        """Positions and distances in km of the airstrips within `radius_km` of every point.
+
+        Returns one (positions, distances) pair per point, nearest first.
+        """
+        candidates, vectors = self._candidates(mask)
+        threshold = np.cos(min(radius_km / EARTH_RADIUS_KM, np.pi))
+        results = []
+        for _, similarity in self._blocks(latitudes, longitudes, vectors):
+            for row in similarity:
+                hits = np.flatnonzero(row >= threshold)
+                order = np.argsort(-row[hits], kind='stable')
+                hits = hits[order]
+                results.append((candidates[hits], EARTH_RADIUS_KM * np.arccos(np.clip(row[hits], -1., 1.))))
+        return results
+
+    def in_bbox(self, north, south, east, west, mask=None):
+        """Positions of the airstrips inside a bounding box, which may cross the antimeridian."""
+        latitude, longitude = self.table.latitude, self.table.longitude
+        inside = (latitude <= north) & (latitude >= south)
+        if west <= east:
+            inside &= (longitude >= west) & (longitude <= east)
+        else:
+            inside &= (longitude >= west) | (longitude <= east)
+        if mask is not None:
+            inside &= mask
+        return np.flatnonzero(inside)
@@ -0,0 +1,175 @@
+"""Match records of several sources by proximity and name similarity.
+
+Records are hashed into a grid of cubic cells over their unit vectors,
+with cells as large as the distance threshold, so only records of the
+same or neighbouring cells are compared and matching stays near-linear.
+Candidate pairs are then accepted greedily, most similar names first,
+and a cluster never takes two records of the same source.
+"""
+
+import difflib
+import itertools
+import re
+import unicodedata
+
+import numpy as np
+
+from .index import EARTH_RADIUS_KM, haversine, unit_vectors
+
+
+DEFAULT_DISTANCE_KM = 2.
+DEFAULT_SIMILARITY = .8
+# Words which tell nothing about which airstrip a name is
+GENERIC_WORDS = {"airport", "airfield", "airstrip", "aerodrome", "aeroport", "strip", "piste", "ville"}
+# Grid cell coordinates are packed into one int64 key, 21 bits each
+CELL_BITS = 21
+CELL_OFFSET = 1 << (CELL_BITS - 1)
+# The own cell and half of the neighbouring cells, the other half is
+# found from the neighbour's side
+NEIGHBOURS = np.array(
+    [offset for offset in itertools.product((-1, 0, 1), repeat=3) if offset >= (0, 0, 0)], dtype=np.int64
+)
+
+
+def normalize_name(name):
+    """Case, accent, punctuation and generic word insensitive form of a name."""
+    if not isinstance(name, str):
+        return ""
+    name = unicodedata.normalize('NFKD', name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).casefold()
+    words = re.sub(r"[^0-9a-z]+", " ", name).split()
+    return " ".join(word for word in words if word not in GENERIC_WORDS)
+
+def name_similarity(a, b):
+    """Similarity of two normalised names from 0 to 1, unknown names are not similar."""
+    if not a or not b:
+        return 0.
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+def cell_keys(cells):
+    return ((cells[..., 0] + CELL_OFFSET) << (2 * CELL_BITS)
+            | (cells[..., 1] + CELL_OFFSET) << CELL_BITS
+            | (cells[..., 2] + CELL_OFFSET))
+
+def candidate_pairs(latitudes, longitudes, max_distance_km):
+    """Index pairs (i < j) of the points at most `max_distance_km` apart."""
+    vectors = unit_vectors(latitudes, longitudes)
+    # Points closer than the cell size along the sphere are closer along a chord,
+    # so they lie in the same or a neighbouring cell
+    cell_size = max(max_distance_km, .01) / EARTH_RADIUS_KM
+    cells = np.floor(vectors / cell_size).astype(np.int64)
+    keys = cell_keys(cells)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    firsts, seconds = [], []
+    for offset in NEIGHBOURS:
+        neighbours = cell_keys(cells + offset)
+        starts = np.searchsorted(sorted_keys, neighbours, 'left')
+        counts = np.searchsorted(sorted_keys, neighbours, 'right') - starts
+        first = np.repeat(np.arange(len(keys)), counts)
+        # Position within each run of equal keys
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(starts, counts) + within]
+        if not offset.any():
+            keep = first < second
+            first, second = first[keep], second[keep]
+        firsts.append(np.minimum(first, second))
+        seconds.append(np.maximum(first, second))
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+
+    distances = haversine(latitudes[first], longitudes[first], latitudes[second], longitudes[second])
+    close = distances <= max_distance_km
+    return first[close], second[close], distances[close]
+
+
+class Matches(object):
+    """Result of `match`, one entry per record.
+
+    `cluster` is the first record of the cluster of every record, the
+    record itself when it matched nothing. `partner`, `distance` and
+    `similarity` tell which record it was matched to and how, -1 and NaN
+    when unmatched.
+    """
+
+    def __init__(self, cluster, partner, distance, similarity):
+        self.cluster = cluster
+        self.partner = partner
+        self.distance = distance
+        self.similarity = similarity
+
+    @property
+    def matched(self):
+        return self.partner >= 0
+
+
+def match(sources, latitudes, longitudes, names, keyed=None,
+          max_distance_km=DEFAULT_DISTANCE_KM, min_similarity=DEFAULT_SIMILARITY):
+    """Cluster the records of different `sources` which are close and alike.
+
+    All arguments are arrays with one entry per record, of all sources
+    together. Records with unknown coordinates match nothing. Two `keyed`
+    records, which already have an identity such as an ICAO, are never
+    matched to each other.
+    """
+    sources = np.asarray(sources)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    n = len(sources)
+    cluster = np.arange(n)
+    partner = np.full(n, -1, dtype=np.int64)
+    distance = np.full(n, np.nan)
+    similarity = np.full(n, np.nan)
+
+    located = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+    first, second, distances = candidate_pairs(latitudes[located], longitudes[located], max_distance_km)
+    first, second = located[first], located[second]
+    other = sources[first] != sources[second]
+    if keyed is not None:
+        keyed = np.asarray(keyed, dtype=bool)
+        other &= ~(keyed[first] & keyed[second])
+    first, second, distances = first[other], second[other], distances[other]
+
+    normalized = {}
+    def normal(i):
+        if i not in normalized:
+            normalized[i] = normalize_name(names[i])
+        return normalized[i]
+    similarities = np.fromiter(
+        (name_similarity(normal(i), normal(j)) for i, j in zip(first.tolist(), second.tolist())),
+        dtype=np.float64, count=len(first),
+    )
+    alike = similarities >= min_similarity
+    first, second, distances, similarities = first[alike], second[alike], distances[alike], similarities[alike]
+
+    # Union-find over clusters, each holding at most one record per source
+    parent = list(range(n))
+    members = {}
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    source_codes = np.unique(sources, return_inverse=True)[1].tolist()
+    for k in np.lexsort((distances, -similarities)).tolist():
+        i, j = int(first[k]), int(second[k])
+        a, b = root(i), root(j)
+        if a == b:
+            continue
+        sources_a = members.get(a, {source_codes[a]})
+        sources_b = members.get(b, {source_codes[b]})
+        if sources_a & sources_b:
+            continue
+        a, b = min(a, b), max(a, b)
+        parent[b] = a
+        members[a] = sources_a | sources_b
+        members.pop(b, None)
+        for record, to in ((i, j), (j, i)):
+            if partner[record] < 0:
+                partner[record] = to
+                distance[record] = distances[k]
+                similarity[record] = similarities[k]
+
+    cluster[:] = [root(i) for i in range(n)]
+    return Matches(cluster, partner, distance, similarity)
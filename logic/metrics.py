@@ -0,0 +1,100 @@
+"""Run metrics."""
+
+import json
+import os
+import resource
+import sys
+import time
+
+from contextlib import contextmanager
+
+
+class StageMetrics(object):
+    """Wall time, CPU time and peak RSS after one stage."""
+
+    __slots__ = ('name', 'wall_seconds', 'cpu_seconds', 'peak_rss_bytes')
+
+    def __init__(self, name, wall_seconds, cpu_seconds, peak_rss_bytes):
+        self.name = name
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.peak_rss_bytes = peak_rss_bytes
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class RunMetrics(object):
+    """Per stage timings and row counts of one logic run.
+
+    Logic implementations add to `counts` while they run, the stages are
+    timed by `Logic.run`. Collecting costs a few clock reads per stage.
+    """
+
+    COUNTS = [
+        "rows_read",
+        "skipped_outside",
+        "invalid_required",
+        "invalid_coordinates",
+        "matched_proximity",
+        "altitudes_filled",
+        "rows_written",
+    ]
+
+    def __init__(self):
+        self.stages = []
+        self.counts = dict.fromkeys(self.COUNTS, 0)
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append(StageMetrics(
+                name,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                peak_rss_bytes(),
+            ))
+
+    def to_dict(self):
+        return dict(
+            stages=[stage.to_dict() for stage in self.stages],
+            counts=dict(self.counts),
+        )
+
+    def to_prometheus(self):
+        lines = []
+        for key, help_text in [
+            ("wall_seconds", "Wall time per stage."),
+            ("cpu_seconds", "CPU time per stage."),
+            ("peak_rss_bytes", "Peak resident set size after each stage."),
+        ]:
+            lines.append("# HELP airstripmap_stage_{} {}".format(key, help_text))
+            lines.append("# TYPE airstripmap_stage_{} gauge".format(key))
+            for stage in self.stages:
+                lines.append('airstripmap_stage_{}{{stage="{}"}} {}'.format(key, stage.name, getattr(stage, key)))
+        lines.append("# HELP airstripmap_rows Rows read, skipped and written.")
+        lines.append("# TYPE airstripmap_rows gauge")
+        for key, value in self.counts.items():
+            lines.append('airstripmap_rows{{kind="{}"}} {}'.format(key, value))
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        """Write JSON, or a Prometheus textfile for paths ending in .prom."""
+        if str(path).endswith(".prom"):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_dict(), indent=2)
+        # Replace atomically, textfile collectors may read at any time
+        tmp = "{}.tmp".format(path)
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
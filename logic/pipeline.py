@@ -0,0 +1,53 @@
+"""Threads connected by bounded queues."""
+
+import queue
+import threading
+
+
+# Items a producer may run ahead of its consumer
+QUEUE_SIZE = 2
+
+_DONE = object()
+
+
+def threaded(iterable, maxsize=QUEUE_SIZE):
+    """Iterate `iterable` in a background thread, at most `maxsize` items ahead.
+
+    Exceptions of the producer are raised in the consumer, a consumer
+    stopping early stops the producer.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_DONE, e))
+        else:
+            put((_DONE, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
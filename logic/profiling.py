@@ -0,0 +1,105 @@
+"""Per stage profiling.
+
+Every stage runs under cProfile and a sampling thread. The profile is
+saved as `<stage>.pstats`, the sampled stacks in collapsed form as
+`<stage>.folded` for flamegraph tools (flamegraph.pl, speedscope) and the
+hottest functions are printed. Worker processes (`--jobs`) are not
+profiled.
+"""
+
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+
+logger = logging.getLogger('cli')
+
+DEFAULT_TOP = 10
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread and counts the collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def frame_label(code):
+    return "{} ({}:{})".format(
+        getattr(code, 'co_qualname', code.co_name), Path(code.co_filename).name, code.co_firstlineno
+    )
+
+def collapse(frame):
+    """Root first, semicolon separated frames of a stack."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+def summary(stats, top=DEFAULT_TOP):
+    """Lines of the `top` functions by own time."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    lines = ["{:>10} {:>10} {:>10}  {}".format("calls", "tottime", "cumtime", "function")]
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in rows:
+        lines.append("{:>10} {:>10.3f} {:>10.3f}  {} ({}:{})".format(
+            calls, tottime, cumtime, function, Path(filename).name, line
+        ))
+    return lines
+
+
+class StageProfiler(object):
+    """Profiles stages into `directory`."""
+
+    def __init__(self, directory, top=DEFAULT_TOP, interval=SAMPLE_INTERVAL):
+        self.directory = Path(directory)
+        self.top = top
+        self.interval = interval
+
+    @contextmanager
+    def stage(self, name):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profile = cProfile.Profile()
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            self.save(name, profile, sampler.stacks)
+
+    def save(self, name, profile, stacks):
+        profile.dump_stats(str(self.directory / "{}.pstats".format(name)))
+        with open(self.directory / "{}.folded".format(name), 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write("{} {}\n".format(stack, count))
+
+        lines = ["Stage {}, top {} functions by own time:".format(name, self.top)]
+        lines.extend(summary(pstats.Stats(profile), self.top))
+        out = "\n".join(lines)
+        logger.info(out)
+        print(out)
@@ -1 +1,3 @@
+from . import cache
 from . import csv
+from . import pool
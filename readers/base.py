@@ -3,6 +3,14 @@
 
 class Reader(object):
     """Base reader class, defines contracts for inheriting classes."""
+    NAME = None
+    VERSION = 0
+    KEYS = []
+
+    @classmethod
+    def accepts(cls, columns):
+        """Check whether a file with these columns is meant for this reader."""
+        return sorted(columns) == sorted(cls.KEYS)
 
     def read(self, path):
         raise NotImplementedError
@@ -0,0 +1,123 @@
+"""Content addressed cache for parsed input files."""
+
+import hashlib
+import logging
+import os
+import pandas
+import tempfile
+
+from pathlib import Path
+
+
+logger = logging.getLogger('cli')
+
+DEFAULT_DIRECTORY = Path.home() / ".cache" / "airstripmap"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SUFFIX = ".pkl"
+
+
+class ParseCache(object):
+    """Stores parsed DataFrames keyed by file content and reader schema.
+
+    Entries are pickled with protocol 5, which round-trips dtypes exactly
+    and loads without re-parsing any text. The least recently used entries
+    are evicted once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, pure_path, reader):
+        digest = hashlib.sha256()
+        # Reader identity and schema, so changed readers never see stale entries
+        digest.update("{}:{}:{}:{}\n".format(
+            reader.__name__, reader.VERSION, reader.KEYS, sorted(reader.DTYPES)
+        ).encode('utf-8'))
+        with open(pure_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, key):
+        path = self.directory / (key + SUFFIX)
+        try:
+            data = pandas.read_pickle(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # Truncated, corrupt or written by other pandas
+            logger.warning("Discarding unreadable parse cache entry {}: {}".format(path.name, e))
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            return None
+        os.utime(path)  # Mark as recently used
+        return data
+
+    def put(self, key, data):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            data.to_pickle(tmp, protocol=5)
+            os.replace(tmp, self.directory / (key + SUFFIX))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in self.directory.glob("*" + SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # Evicted concurrently
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.debug("Evicting {} from parse cache".format(path.name))
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class WarmCache(object):
+    """Keeps parsed DataFrames in memory between runs of a long-lived process.
+
+    Entries are keyed by path and file stamp (mtime, size), so unchanged
+    files are neither parsed nor hashed again. Misses fall back to the
+    `backing` parse cache, if one is given.
+    """
+
+    def __init__(self, backing=None):
+        self.backing = backing
+        self.entries = {}
+
+    def key(self, pure_path, reader):
+        stat = os.stat(pure_path)
+        return (str(pure_path), stat.st_mtime_ns, stat.st_size, reader)
+
+    def get(self, key):
+        path, _, _, reader = key
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        if self.backing is None:
+            return None
+        data = self.backing.get(self.backing.key(path, reader))
+        if data is not None:
+            self.entries[path] = (key, data)
+        return data
+
+    def put(self, key, data):
+        path, _, _, reader = key
+        self.entries[path] = (key, data)
+        if self.backing is not None:
+            self.backing.put(self.backing.key(path, reader), data)
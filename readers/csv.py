@@ -1,46 +1,117 @@
 """"CSV parsing."""
 
 
+import importlib.util
+import logging
 import pandas
 
 from pathlib import PurePath
 from .base import Reader
 
+# Looked up without importing pyarrow, pandas imports it when parsing
+ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
 
-class HajaReader(Reader):
-    KEYS = ["Name", "ICAO", "Latitude", "Longitude", "Open", "Usage"]
+
+logger = logging.getLogger('cli')
+
+
+def read_header(pure_path):
+    """Read only the column names of a csv file."""
+    return list(pandas.read_csv(pure_path, nrows=0).columns)
+
+
+class CSVReader(Reader):
+    """Reads csv files with a known header into an ICAO indexed DataFrame."""
+    # Bump when parsing changes, invalidates cached parses
+    VERSION = 2
+    # Columns parsed as text regardless of their content
+    DTYPES = {}
+
+    def parse(self, pure_path):
+        # Parse csv into a pandas DataFrame
+        df = pandas.read_csv(pure_path, usecols=self.KEYS, dtype=self.DTYPES, engine=ENGINE)
+        # Skip empty rows
+        df.dropna(how="all", inplace=True)
+        # Drop duplicate ICAO entries for indexing, rows without ICAO are all kept
+        df = df[df.ICAO.isna() | ~df.ICAO.duplicated(keep='first')]
+        return df.set_index("ICAO")  # Set index on airstrip ICAO
+
+    def parse_chunks(self, pure_path, chunksize):
+        """Parse in DataFrames of up to `chunksize` rows.
+
+        Empty rows are dropped and only the first row of every ICAO is kept,
+        across all chunks, like `parse` does for the whole file.
+        """
+        seen = set()
+        # The pyarrow engine does not read in chunks
+        for df in pandas.read_csv(pure_path, usecols=self.KEYS, dtype=self.DTYPES, chunksize=chunksize):
+            # Skip empty rows
+            df = df.dropna(how="all")
+            # Drop ICAOs already seen in this or an earlier chunk
+            missing = df.ICAO.isna()
+            df = df[missing | ~(df.ICAO.duplicated(keep='first') | df.ICAO.isin(seen))]
+            seen.update(df.ICAO[df.ICAO.notna()])
+            yield df.set_index("ICAO")  # Set index on airstrip ICAO
 
     def read(self, pure_path):
         data = None
-        if pure_path.suffix == ".csv":
-            # Parse csv into a pandas DataFrame
-            df = pandas.read_csv(pure_path)
-            # Skip empty rows
-            df.dropna(how="all", inplace=True)
-            # Drop duplicate ICAO entries for indexing
-            df.drop_duplicates(subset=["ICAO"], keep='first', inplace=True)
-            # Check csv file type
-            if sorted(df.keys()) == sorted(self.KEYS):
-                data = df.set_index("ICAO")  # Set index on airstrip ICAO
-        return "haja", data
+        # Check csv file type before parsing the whole file
+        if pure_path.suffix == ".csv" and self.accepts(read_header(pure_path)):
+            data = self.parse(pure_path)
+        return self.NAME, data
 
 
-class WingmanReader(Reader):
+class HajaReader(CSVReader):
+    NAME = "haja"
+    KEYS = ["Name", "ICAO", "Latitude", "Longitude", "Open", "Usage"]
+    DTYPES = {key: str for key in KEYS}
+
+
+class WingmanReader(CSVReader):
+    NAME = "wingman"
     KEYS = ["Abbreviation", "Name", "ICAO", "Latitude", "Longitude", "Elev (ft)",
        "Ctry", "Owner", "Avgas", "Jet", "Direction", "Class", "Surface",
        "Length", "Width", "Comments", "Last Insp", "Freq (mths)", "Closed",
        "Waypt. Only", "Dep. Tax"]
+    DTYPES = {key: str for key in [
+        "Name", "ICAO", "Latitude", "Longitude", "Elev (ft)", "Ctry", "Owner",
+        "Class", "Surface", "Length", "Width", "Comments", "Last Insp", "Closed"]}
 
-    def read(self, pure_path):
-        data = None
-        if pure_path.suffix == ".csv":
-            # Parse csv into a pandas DataFrame
-            df = pandas.read_csv(pure_path)
-            # Skip empty rows
-            df.dropna(how="all", inplace=True)
-            # Drop duplicate ICAO entries for indexing
-            df.drop_duplicates(subset=["ICAO"], keep='first', inplace=True)
-            # Check csv file type
-            if sorted(df.keys()) == sorted(self.KEYS):
-                data = df.set_index("ICAO")  # Set index on airstrip ICAO
-        return "wingman", data
+
+def sniff(pure_path, readers):
+    """Return the first of the readers accepting the csv header, if any."""
+    if pure_path.suffix != ".csv":
+        return None
+    columns = read_header(pure_path)
+    for reader in readers:
+        if reader.accepts(columns):
+            return reader
+    return None
+
+def read_path(pure_path, readers, cache=None):
+    """Parse a csv file with the reader matching its header.
+
+    Returns the reader name and data or (None, None) if no reader matches.
+    Unchanged files are loaded from the parse cache, if one is given.
+    """
+    reader = sniff(pure_path, readers)
+    if reader is None:
+        return None, None
+    if cache is None:
+        return reader.NAME, reader().parse(pure_path)
+
+    key = cache.key(pure_path, reader)
+    data = cache.get(key)
+    if data is None:
+        data = reader().parse(pure_path)
+        cache.put(key, data)
+    else:
+        logger.info("Loaded {} from parse cache".format(pure_path))
+    return reader.NAME, data
+
+def read_path_chunks(pure_path, readers, chunksize):
+    """Like `read_path`, but the data is a lazy stream of DataFrame chunks."""
+    reader = sniff(pure_path, readers)
+    if reader is None:
+        return None, None
+    return reader.NAME, reader().parse_chunks(pure_path, chunksize)
@@ -0,0 +1,60 @@
+"""Parallel input reading in worker processes."""
+
+import multiprocessing
+import pickle
+
+from . import csv
+
+
+def _read(conn, pure_path, readers, cache):
+    name, data = csv.read_path(pure_path, readers, cache)
+    # Send array data as out-of-band buffers straight through the pipe
+    # instead of copying it into the pickle stream
+    buffers = []
+    payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+    buffers = [buffer.raw() for buffer in buffers]
+    conn.send((name, payload, [buffer.nbytes for buffer in buffers]))
+    for buffer in buffers:
+        conn.send_bytes(buffer)
+    conn.close()
+
+
+def _receive(conn):
+    name, payload, sizes = conn.recv()
+    buffers = []
+    for size in sizes:
+        buffer = bytearray(size)
+        conn.recv_bytes_into(buffer)
+        buffers.append(buffer)
+    conn.close()
+    return name, pickle.loads(payload, buffers=buffers)
+
+
+def read_paths(pure_paths, readers, jobs, cache=None):
+    """Read files in up to `jobs` worker processes.
+
+    Yields (name, data) pairs in the order of `pure_paths`.
+    """
+    running = []
+
+    def start(pure_path):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_read, args=(sender, pure_path, readers, cache))
+        process.start()
+        sender.close()
+        running.append((process, receiver))
+
+    pending = list(pure_paths)
+    while pending and len(running) < jobs:
+        start(pending.pop(0))
+    while running:
+        process, receiver = running.pop(0)
+        try:
+            result = _receive(receiver)
+        except EOFError:
+            process.join()
+            raise RuntimeError("Reader process failed with exit code {}".format(process.exitcode))
+        process.join()
+        if pending:
+            start(pending.pop(0))
+        yield result
@@ -0,0 +1,70 @@
+"""Regions a batch run writes separate outputs for.
+
+A region file is a YAML list of regions:
+
+    - code: MG
+      name: Madagascar
+      bounds: {north: -11.6, south: -26.0, east: 51.6, west: 42.7}
+      gov_airports:
+        Antananarivo/Ivato: big
+"""
+
+import constants
+
+
+class Region(object):
+    """Country code, bounding box and government airport styles of a region."""
+
+    __slots__ = ('code', 'name', 'north', 'south', 'east', 'west', 'gov_airports')
+
+    def __init__(self, code, name=None, north=90., south=-90., east=180., west=-180., gov_airports=None):
+        self.code = code
+        self.name = name or code
+        self.north = north
+        self.south = south
+        self.east = east
+        self.west = west
+        self.gov_airports = dict(gov_airports or {})
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.code)
+
+    @property
+    def bounds(self):
+        return dict(north=self.north, south=self.south, east=self.east, west=self.west)
+
+
+DEFAULT = Region(constants.COUNTRY, constants.COUNTRY_NAME, gov_airports=constants.GOV_AIRPORTS, **constants.BOUNDS)
+
+
+def load(path):
+    import yaml
+
+    with open(path, 'r') as f:
+        entries = yaml.safe_load(f.read())
+    regions = []
+    for entry in entries:
+        regions.append(Region(
+            entry['code'],
+            entry.get('name'),
+            gov_airports=entry.get('gov_airports'),
+            **entry.get('bounds', {}),
+        ))
+    if len({region.code for region in regions}) != len(regions):
+        raise ValueError('Duplicate region codes in {}'.format(path))
+    return regions
+
+def activate(region):
+    """Style and bound the KML of this process for `region`.
+
+    Changes module state in place, meant for worker processes writing a
+    single region.
+    """
+    from writers.kml.components import latlonaltbox
+
+    constants.GOV_AIRPORTS.clear()
+    constants.GOV_AIRPORTS.update(region.gov_airports)
+    latlonaltbox.north = region.north
+    latlonaltbox.south = region.south
+    latlonaltbox.east = region.east
+    latlonaltbox.west = region.west
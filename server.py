@@ -0,0 +1,196 @@
+"""Watch the input files and serve the latest KML over HTTP.
+
+The inputs are polled by mtime and rebuilt in the background when they
+change. The latest KML, its gzip encoding and a KMZ are kept in memory
+and served with an ETag, so clients polling unchanged data get a 304.
+Parsed inputs stay in memory between rebuilds.
+"""
+
+import gzip
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import readers
+
+
+logger = logging.getLogger('cli')
+
+DEFAULT_PORT = 8000
+DEFAULT_INTERVAL = 2.
+DEFAULT_NAME = "airstrips"
+KML_TYPE = "application/vnd.google-earth.kml+xml"
+KMZ_TYPE = "application/vnd.google-earth.kmz"
+
+
+class Snapshot(object):
+    """One build of the KML, ready to serve."""
+
+    __slots__ = ('kml', 'kml_gzip', 'kmz', 'etag')
+
+    def __init__(self, kml):
+        self.kml = kml
+        self.kml_gzip = gzip.compress(kml, mtime=0)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as kmz:
+            kmz.writestr("doc.kml", kml)
+        self.kmz = buffer.getvalue()
+        self.etag = hashlib.sha1(kml).hexdigest()
+
+
+class Builder(object):
+    """Rebuilds the KML with a logic class whenever the inputs change."""
+
+    def __init__(self, logic_cls, in_paths, out_path=None, interval=DEFAULT_INTERVAL, **options):
+        if options.get('writer') == "tiles":
+            raise ValueError('The tiles writer can not be served, it writes a directory')
+        if options.get('regions'):
+            raise ValueError('Region batches can not be served, they write a file per region')
+        if options.get('incremental'):
+            raise ValueError('Incremental builds can not be served, every build is written in full')
+        self.logic_cls = logic_cls
+        self.in_paths = list(in_paths)
+        self.out_path = out_path
+        self.interval = interval
+        self.options = options
+        backing = None
+        if options.pop('cache', False):
+            backing = readers.cache.ParseCache(
+                options.get('cache_dir') or readers.cache.DEFAULT_DIRECTORY,
+                options.get('cache_size') or readers.cache.DEFAULT_MAX_BYTES,
+            )
+        self.cache = readers.cache.WarmCache(backing)
+        self.snapshot = None
+        self.stamps = None
+        self._stop_event = threading.Event()
+
+    def stamp(self):
+        stamps = []
+        for path in self.in_paths:
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return stamps
+
+    def build(self):
+        with tempfile.TemporaryDirectory(prefix="airstripmap-") as directory:
+            out_path = self.out_path or os.path.join(directory, DEFAULT_NAME + ".kml")
+            # Workers would fill their own copy of the warm cache, read in process.
+            # Only the KML is served.
+            options = dict(self.options, jobs=1, formats=["kml"])
+            logic = self.logic_cls(list(self.in_paths), out_path, parse_cache=self.cache, **options)
+            logic.run()
+            # The path the KML was written to, --out may have the extension of another format
+            with open(logic.format_paths()[0], 'rb') as f:
+                kml = f.read()
+        self.snapshot = Snapshot(kml)
+        # Drop stale entries of files which are no longer read
+        for path in set(self.cache.entries) - set(map(str, self.in_paths)):
+            del self.cache.entries[path]
+        logger.info("Serving build {}".format(self.snapshot.etag))
+
+    def poll(self):
+        """Rebuild if the inputs changed, returns whether a build was attempted."""
+        stamps = self.stamp()
+        if stamps == self.stamps:
+            return False
+        self.stamps = stamps
+        try:
+            self.build()
+        except Exception:
+            # Keep serving the last good build
+            logger.exception("Rebuild failed")
+        return True
+
+    def watch(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        self.poll()
+        thread = threading.Thread(target=self.watch, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def handler(builder, name=DEFAULT_NAME):
+    """Request handler class serving the builds of `builder` as `/<name>.kml` and `/<name>.kmz`."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_HEAD(self):
+            self.respond(body=False)
+
+        def do_GET(self):
+            self.respond(body=True)
+
+        def respond(self, body):
+            path = self.path.split('?', 1)[0]
+            snapshot = builder.snapshot
+            if path not in ("/", "/{}.kml".format(name), "/{}.kmz".format(name)):
+                return self.send_error(HTTPStatus.NOT_FOUND)
+            if snapshot is None:
+                return self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, "No build yet")
+
+            if path.endswith(".kmz"):
+                etag = '"{}-kmz"'.format(snapshot.etag)
+                content_type, content, encoding = KMZ_TYPE, snapshot.kmz, None
+            elif "gzip" in self.headers.get("Accept-Encoding", ""):
+                etag = '"{}-gzip"'.format(snapshot.etag)
+                content_type, content, encoding = KML_TYPE, snapshot.kml_gzip, "gzip"
+            else:
+                etag = '"{}"'.format(snapshot.etag)
+                content_type, content, encoding = KML_TYPE, snapshot.kml, None
+
+            if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            if body:
+                self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            logger.debug("{} - {}".format(self.address_string(), format % args))
+
+    return Handler
+
+
+def serve(builder, host="", port=DEFAULT_PORT):
+    """Build, then watch and serve until interrupted."""
+    name = Path(builder.out_path).stem if builder.out_path else DEFAULT_NAME
+    builder.start()
+    httpd = ThreadingHTTPServer((host, port), handler(builder, name))
+    out = "Serving /{0}.kml and /{0}.kmz on port {1}".format(name, httpd.server_address[1])
+    logger.info(out)
+    print(out)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        builder.stop()
+        httpd.server_close()
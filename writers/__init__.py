@@ -1 +1,40 @@
-from . import kml
\ No newline at end of file
+"""Output writers and their registry.
+
+A format is registered with a name, a file extension and a function
+`write(airstrips, path, precision=None)` returning the number of written
+airstrips, `precision` rounds coordinates to that many decimals.
+"""
+
+
+class Format(object):
+    """A registered output format."""
+
+    __slots__ = ('name', 'extension', 'write')
+
+    def __init__(self, name, extension, write):
+        self.name = name
+        self.extension = extension
+        self.write = write
+
+
+FORMATS = {}
+
+
+def register(name, extension, write):
+    FORMATS[name] = Format(name, extension, write)
+
+def get(name):
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError('Invalid format: {}'.format(name)) from None
+
+
+from . import csv, geojson, gpx, kml, snapshot  # noqa: E402
+
+register("kml", ".kml", kml.write)
+register("kmz", ".kmz", kml.write_kmz)
+register("geojson", ".geojson", geojson.write)
+register("gpx", ".gpx", gpx.write)
+register("csv", ".csv", csv.write)
+register("snapshot", ".snap", snapshot.write)
@@ -0,0 +1,29 @@
+"""CSV generation."""
+
+import csv
+import logging
+
+from .kml import BUFFER_SIZE, rows
+
+
+logger = logging.getLogger('cli')
+
+KEYS = ["Name", "Latitude", "Longitude", "Elev (m)", "Status", "Description"]
+
+
+def write(airstrips, path, precision=None):
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='', buffering=BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(KEYS)
+        for name, description, latitude, longitude, altitude, status in rows(airstrips):
+            if precision is not None:
+                latitude, longitude = round(latitude, precision), round(longitude, precision)
+            writer.writerow([name, latitude, longitude, altitude, status, description])
+            count += 1
+
+    out = "Generated CSV file with {} airstrips.".format(count)
+    logger.info(out)
+    print(out)
+
+    return count
@@ -0,0 +1,54 @@
+"""GeoJSON generation.
+
+Features are serialised one by one from format strings, the document is
+never built as a whole in memory.
+"""
+
+import json
+import logging
+import math
+
+from .kml import BUFFER_SIZE, rows, style_key
+
+
+logger = logging.getLogger('cli')
+
+# C accelerated string encoder of the json module
+encode_string = json.encoder.encode_basestring
+
+FEATURE = (
+    '{{"type":"Feature",'
+    '"geometry":{{"type":"Point","coordinates":[{!r},{!r}]}},'
+    '"properties":{{"name":{},"description":{},"elevation_m":{},"status":{},"style":{}}}}}'
+)
+
+
+def feature(name, description, latitude, longitude, altitude, status, precision=None):
+    longitude, latitude = float(longitude), float(latitude)
+    if precision is not None:
+        longitude, latitude = round(longitude, precision), round(latitude, precision)
+    return FEATURE.format(
+        longitude, latitude,
+        encode_string(str(name)),
+        encode_string(str(description)),
+        repr(float(altitude)) if math.isfinite(altitude) else "null",
+        encode_string(status),
+        encode_string(style_key(name, status)),
+    )
+
+def write(airstrips, path, precision=None):
+    count = 0
+    with open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as f:
+        f.write('{"type":"FeatureCollection","features":[\n')
+        for row in rows(airstrips):
+            if count:
+                f.write(',\n')
+            f.write(feature(*row, precision=precision))
+            count += 1
+        f.write('\n]}\n')
+
+    out = "Generated GeoJSON file with {} airstrips.".format(count)
+    logger.info(out)
+    print(out)
+
+    return count
@@ -0,0 +1,41 @@
+"""GPX waypoint generation for handheld units."""
+
+import html
+import logging
+import math
+
+from .kml import BUFFER_SIZE, rows
+
+
+logger = logging.getLogger('cli')
+
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="airstripmap" xmlns="http://www.topografix.com/GPX/1/1">\n'
+    '<metadata><name>MAF Airstrips</name></metadata>\n'
+)
+GPX_FOOTER = '</gpx>\n'
+
+
+def waypoint(name, description, latitude, longitude, altitude, status, precision=None):
+    if precision is not None:
+        latitude, longitude = round(latitude, precision), round(longitude, precision)
+    elevation = "<ele>{}</ele>".format(altitude) if math.isfinite(altitude) else ""
+    return '<wpt lat="{}" lon="{}">{}<name>{}</name><desc>{}</desc><sym>Airport</sym></wpt>\n'.format(
+        latitude, longitude, elevation, html.escape(str(name)), html.escape(str(description))
+    )
+
+def write(airstrips, path, precision=None):
+    count = 0
+    with open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as f:
+        f.write(GPX_HEADER)
+        for row in rows(airstrips):
+            f.write(waypoint(*row, precision=precision))
+            count += 1
+        f.write(GPX_FOOTER)
+
+    out = "Generated GPX file with {} airstrips.".format(count)
+    logger.info(out)
+    print(out)
+
+    return count
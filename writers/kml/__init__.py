@@ -1,7 +1,10 @@
 """KML generation"""
 
+import html
+import io
 import logging
 import simplekml
+import zipfile
 
 from constants import GOV_AIRPORTS
 from .components import (
@@ -13,6 +16,12 @@ from .components import (
 
 logger = logging.getLogger('cli')
 
+BUFFER_SIZE = 1024 * 1024
+# Decimals of KMZ coordinates, about 0.1 m
+DEFAULT_PRECISION = 6
+KMZ_ENTRY = "doc.kml"
+STYLES = [green, yellow, orange, red, small_airport, medium_airport, big_airport]
+
 AIRSTRIP_STYLE_MAP = {
     "small": small_airport,
     "medium": medium_airport,
@@ -23,13 +32,31 @@ AIRSTRIP_STYLE_MAP = {
     "c": orange,
     "x": red,
 }
+# Stable style ids instead of the creation counter of simplekml, placemarks
+# spliced from a previous output keep referencing the same styles
+for key, airstrip_style in AIRSTRIP_STYLE_MAP.items():
+    airstrip_style._id = key
 
 
 def style(airstrip):
-    key = GOV_AIRPORTS.get(airstrip.name) or airstrip.status
-    return AIRSTRIP_STYLE_MAP[key]
+    return style_for(airstrip.name, airstrip.status)
+
+def style_key(name, status):
+    return GOV_AIRPORTS.get(name) or status
+
+def style_for(name, status):
+    return AIRSTRIP_STYLE_MAP[style_key(name, status)]
+
+def rows(airstrips):
+    """Iterate over airstrip tuples, column-wise for an `AirstripTable`."""
+    if hasattr(airstrips, "rows"):
+        return airstrips.rows()
+    return (
+        (a.name, a.description, a.latitude, a.longitude, a.altitude, a.status)
+        for a in airstrips
+    )
 
-def write(airstrips, path):
+def write(airstrips, path, precision=None):
     # Document
     kml = simplekml.Kml(name="MAF Airstrips", open=1)  # the document will be open in the table of contents
 
@@ -38,11 +65,13 @@ def write(airstrips, path):
 
     # Placemarks
     for airstrip in airstrips:
-        logger.info(airstrip)
         pnt = kml.newpoint()
         pnt.name = airstrip.name
         pnt.description = airstrip.description
-        pnt.coords = [(airstrip.longitude, airstrip.latitude, airstrip.altitude)]
+        if precision is None:
+            pnt.coords = [(airstrip.longitude, airstrip.latitude, airstrip.altitude)]
+        else:
+            pnt.coords = [quantize(airstrip.longitude, airstrip.latitude, airstrip.altitude, precision)]
         pnt.style =  style(airstrip)
 
     # Write kml file
@@ -51,3 +80,94 @@ def write(airstrips, path):
     out = "Generated KML file with {} airstrips.".format(len(airstrips))
     logger.info(out)
     print(out)
+
+    return len(airstrips)
+
+KML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+)
+KML_FOOTER = '</kml>\n'
+
+
+def document_header(document_id=None):
+    """Document start with the shared styles and region, without placemarks."""
+    parts = [
+        '<Document id="{}">\n'.format(html.escape(document_id)) if document_id else '<Document>\n',
+        '<name>MAF Airstrips</name>\n',
+        '<open>1</open>\n',  # the document will be open in the table of contents
+    ]
+    # Styles, all of them so placemarks can reference them by id
+    parts.extend("{}\n".format(s) for s in STYLES)
+    # Region
+    parts.append("<Region>{}</Region>\n".format(region))
+    return "".join(parts)
+
+def quantize(longitude, latitude, altitude, precision):
+    """Coordinates rounded to `precision` decimals, without a zero altitude."""
+    if altitude == 0:
+        return (round(longitude, precision), round(latitude, precision))
+    return (round(longitude, precision), round(latitude, precision), round(altitude, precision))
+
+def placemark(name, description, latitude, longitude, altitude, status, placemark_id=None, styles_href="", precision=None):
+    if precision is None:
+        coordinates = (longitude, latitude, altitude)
+    else:
+        coordinates = quantize(longitude, latitude, altitude, precision)
+    return (
+        "<Placemark{}>"
+        "<name>{}</name>"
+        "<description>{}</description>"
+        "<styleUrl>{}#{}</styleUrl>"
+        "<Point><coordinates>{}</coordinates></Point>"
+        "</Placemark>\n".format(
+            ' id="{}"'.format(html.escape(placemark_id)) if placemark_id else "",
+            html.escape(str(name)),
+            html.escape(str(description)),
+            styles_href, style_for(name, status).id,
+            ",".join(map(str, coordinates)),
+        )
+    )
+
+def write_document(f, airstrips, precision=None):
+    """Write a whole KML document to the text file `f`, returns the placemark count."""
+    count = 0
+    f.write(KML_HEADER)
+    f.write(document_header())
+
+    # Placemarks
+    for name, description, latitude, longitude, altitude, status in rows(airstrips):
+        f.write(placemark(name, description, latitude, longitude, altitude, status, precision=precision))
+        count += 1
+
+    f.write('</Document>\n')
+    f.write(KML_FOOTER)
+    return count
+
+def write_stream(airstrips, path, precision=None):
+    """Write placemarks one by one instead of building a simplekml tree.
+
+    Accepts any iterable of airstrips and keeps memory constant.
+    """
+    with open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as f:
+        count = write_document(f, airstrips, precision)
+
+    out = "Generated KML file with {} airstrips.".format(count)
+    logger.info(out)
+    print(out)
+
+    return count
+
+def write_kmz(airstrips, path, precision=DEFAULT_PRECISION):
+    """Stream the document into the doc.kml entry of a KMZ archive."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as kmz:
+        with kmz.open(KMZ_ENTRY, 'w') as entry:
+            with io.TextIOWrapper(io.BufferedWriter(entry, BUFFER_SIZE), encoding='utf-8') as f:
+                count = write_document(f, airstrips, precision)
+        size = kmz.getinfo(KMZ_ENTRY).file_size
+
+    out = "Generated KMZ file with {} airstrips ({} bytes of KML).".format(count, size)
+    logger.info(out)
+    print(out)
+
+    return count
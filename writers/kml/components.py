@@ -3,13 +3,12 @@
 
 import simplekml
 
+from constants import BOUNDS
+
 
 # Region
 latlonaltbox = simplekml.LatLonAltBox(
-    north=-11.63011499099052,
-    south=-26.04605302582592,
-    east=51.58283094574556,
-    west=42.72857522419672,
+    **BOUNDS,
     minaltitude=0,
     maxaltitude=0,
 )
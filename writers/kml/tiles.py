@@ -0,0 +1,161 @@
+"""Region tiled KML super-overlay.
+
+Airstrips are partitioned into a quadtree of lat/lon tiles. Every tile is
+its own KML file holding its placemarks, a Region/Lod and NetworkLinks to
+its child tiles, so viewers only load the tiles that are on screen. More
+important airstrips stay in the upper tiles, the rest moves down the tree.
+"""
+
+import html
+import logging
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from . import (
+    BUFFER_SIZE, KML_HEADER, KML_FOOTER, STYLES,
+    placemark, rows, style_for,
+)
+from .components import (
+    green, yellow, orange, red,
+    small_airport, medium_airport, big_airport
+)
+
+
+logger = logging.getLogger('cli')
+
+DEFAULT_TILE_SIZE = 64
+MAX_DEPTH = 12
+# Pixels a tile region needs on screen before its placemarks are loaded
+MIN_LOD_PIXELS = 256
+STYLES_FILE = "styles.kml"
+# Airstrips styled first stay in the upper tiles
+PRIORITY = [big_airport, medium_airport, small_airport, green, yellow, orange, red]
+
+
+class Tile(object):
+    """Quadtree node: bounds, the rows it holds and its children."""
+
+    __slots__ = ('key', 'north', 'south', 'east', 'west', 'indices', 'children')
+
+    def __init__(self, key, north, south, east, west, indices):
+        self.key = key
+        self.north = north
+        self.south = south
+        self.east = east
+        self.west = west
+        self.indices = indices
+        self.children = []
+
+    @property
+    def filename(self):
+        return "{}.kml".format(self.key)
+
+
+def tile_region(tile, min_lod_pixels):
+    return (
+        "<Region>"
+        "<LatLonAltBox><north>{}</north><south>{}</south><east>{}</east><west>{}</west></LatLonAltBox>"
+        "<Lod><minLodPixels>{}</minLodPixels><maxLodPixels>-1</maxLodPixels></Lod>"
+        "</Region>".format(tile.north, tile.south, tile.east, tile.west, min_lod_pixels)
+    )
+
+def network_link(tile, min_lod_pixels=MIN_LOD_PIXELS, href_prefix=""):
+    return (
+        "<NetworkLink><name>{}</name>{}"
+        "<Link><href>{}</href><viewRefreshMode>onRegion</viewRefreshMode></Link>"
+        "</NetworkLink>\n".format(
+            tile.key, tile_region(tile, min_lod_pixels), html.escape(href_prefix + tile.filename)
+        )
+    )
+
+def build(latitudes, longitudes, order, tile_size=DEFAULT_TILE_SIZE):
+    """Partition row indices, in priority `order`, into a quadtree."""
+    pad = 1e-6
+    root = Tile(
+        "0",
+        float(latitudes.max()) + pad, float(latitudes.min()) - pad,
+        float(longitudes.max()) + pad, float(longitudes.min()) - pad,
+        order,
+    )
+    tiles = [root]
+    stack = [(root, 0)]
+    while stack:
+        tile, depth = stack.pop()
+        indices = tile.indices
+        if len(indices) <= tile_size or depth >= MAX_DEPTH:
+            continue
+        tile.indices, rest = indices[:tile_size], indices[tile_size:]
+        mid_lat = (tile.north + tile.south) / 2
+        mid_lon = (tile.east + tile.west) / 2
+        quadrant = (latitudes[rest] < mid_lat) * 2 + (longitudes[rest] >= mid_lon)
+        for q, (north, south, east, west) in enumerate([
+            (tile.north, mid_lat, mid_lon, tile.west),
+            (tile.north, mid_lat, tile.east, mid_lon),
+            (mid_lat, tile.south, mid_lon, tile.west),
+            (mid_lat, tile.south, tile.east, mid_lon),
+        ]):
+            child_indices = rest[quadrant == q]  # Keeps the priority order
+            if len(child_indices):
+                child = Tile(tile.key + str(q), north, south, east, west, child_indices)
+                tile.children.append(child)
+                tiles.append(child)
+                stack.append((child, depth + 1))
+    return tiles
+
+def _write_tile(path, header, links, tile_rows, precision=None):
+    with open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as f:
+        f.write(KML_HEADER)
+        f.write(header)
+        f.writelines(links)
+        for row in tile_rows:
+            f.write(placemark(*row, styles_href=STYLES_FILE, precision=precision))
+        f.write('</Document>\n')
+        f.write(KML_FOOTER)
+
+def write(airstrips, path, tile_size=DEFAULT_TILE_SIZE, jobs=1, precision=None):
+    """Write a super-overlay: `path` links to tiles in a `<stem>_tiles` directory."""
+    path = Path(path)
+    directory = path.with_name(path.stem + "_tiles")
+    directory.mkdir(parents=True, exist_ok=True)
+
+    data = list(rows(airstrips))
+    latitudes = np.array([row[2] for row in data], dtype=np.float64)
+    longitudes = np.array([row[3] for row in data], dtype=np.float64)
+    ranks = np.array([PRIORITY.index(style_for(row[0], row[5])) for row in data], dtype=np.int64)
+    tiles = build(latitudes, longitudes, np.argsort(ranks, kind='stable'), tile_size) if data else []
+
+    # Shared styles, referenced from every tile
+    _write_tile(
+        directory / STYLES_FILE,
+        "<Document>\n{}".format("".join("{}\n".format(s) for s in STYLES)),
+        [], [],
+    )
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+        for tile in tiles:
+            header = "<Document>\n<name>{}</name>\n{}\n".format(
+                tile.key, tile_region(tile, 0 if tile.key == "0" else MIN_LOD_PIXELS)
+            )
+            links = [network_link(child) for child in tile.children]
+            tile_rows = [data[i] for i in sorted(tile.indices.tolist())]  # Name order within a tile
+            futures.append(executor.submit(
+                _write_tile, directory / tile.filename, header, links, tile_rows, precision
+            ))
+        for future in futures:
+            future.result()
+
+    # Root document
+    links = [network_link(tiles[0], 0, directory.name + "/")] if tiles else []
+    _write_tile(
+        path,
+        "<Document>\n<name>MAF Airstrips</name>\n<open>1</open>\n",
+        links, [],
+    )
+
+    out = "Generated KML super-overlay with {} airstrips in {} tiles.".format(len(data), len(tiles))
+    logger.info(out)
+    print(out)
+
+    return len(data)
@@ -0,0 +1,26 @@
+"""Mapped airstrips saved as a memory mappable snapshot.
+
+Queries, writers and other tools open it with `AirstripTable.load`
+instead of reading and mapping the input files again.
+"""
+
+import logging
+
+
+logger = logging.getLogger('cli')
+
+
+def write(airstrips, path, precision=None):
+    from logic.airstrip import AirstripTable
+
+    if hasattr(airstrips, "tables"):  # Merged chunks
+        airstrips = airstrips.table()
+    elif not isinstance(airstrips, AirstripTable):
+        airstrips = AirstripTable.from_airstrips(airstrips)
+    airstrips.save(path)
+
+    out = "Saved a snapshot of {} airstrips.".format(len(airstrips))
+    logger.info(out)
+    print(out)
+
+    return len(airstrips)